@@ -0,0 +1,40 @@
+"""partial indexes for hot order queries
+
+Revision ID: 5cfc4da4dcba
+Revises: 275256cd85f8
+Create Date: 2026-10-17 10:12:41.518302
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = '5cfc4da4dcba'
+down_revision: Union[str, Sequence[str], None] = '275256cd85f8'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # просрочка черновиков: status_id = 8 AND is_active AND updated_at < ...
+    op.create_index(
+        'ix_orders_draft_updated_at', 'orders', ['updated_at'],
+        unique=False, schema='public',
+        postgresql_where=sa.text('status_id = 8 AND is_active'),
+    )
+    # get_last_order: последний «настоящий» заказ пользователя
+    op.create_index(
+        'ix_orders_user_last_order', 'orders', ['tg_user_id', sa.text('created_at DESC')],
+        unique=False, schema='public',
+        postgresql_where=sa.text('is_active AND status_id NOT IN (6, 7, 8)'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_orders_user_last_order', table_name='orders', schema='public')
+    op.drop_index('ix_orders_draft_updated_at', table_name='orders', schema='public')
@@ -0,0 +1,33 @@
+"""index for active session lookup by user
+
+Revision ID: a78bde210efa
+Revises: e060c3603115
+Create Date: 2026-10-17 11:05:52.640187
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'a78bde210efa'
+down_revision: Union[str, Sequence[str], None] = 'e060c3603115'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    # поиск живой сессии пользователя при /start (get_or_create_session)
+    op.create_index(
+        'ix_sessions_user_active', 'sessions', ['tg_user_id', 'role_id'],
+        unique=False, schema='public',
+        postgresql_where=sa.text('is_active'),
+    )
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index('ix_sessions_user_active', table_name='sessions', schema='public')
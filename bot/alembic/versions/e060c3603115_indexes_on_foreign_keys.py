@@ -0,0 +1,36 @@
+"""indexes on foreign keys used by relationship loads
+
+Revision ID: e060c3603115
+Revises: 5cfc4da4dcba
+Create Date: 2026-10-17 10:41:07.203915
+
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision: str = 'e060c3603115'
+down_revision: Union[str, Sequence[str], None] = '5cfc4da4dcba'
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    """Upgrade schema."""
+    op.create_index(op.f('ix_public_drink_sizes_drink_id'), 'drink_sizes', ['drink_id'], unique=False, schema='public')
+    op.create_index(op.f('ix_public_images_drink_id'), 'images', ['drink_id'], unique=False, schema='public')
+    op.create_index(op.f('ix_public_drink_adds_drink_id'), 'drink_adds', ['drink_id'], unique=False, schema='public')
+    op.create_index(op.f('ix_public_order_adds_order_id'), 'order_adds', ['order_id'], unique=False, schema='public')
+    op.create_index(op.f('ix_public_orders_session_id'), 'orders', ['session_id'], unique=False, schema='public')
+
+
+def downgrade() -> None:
+    """Downgrade schema."""
+    op.drop_index(op.f('ix_public_orders_session_id'), table_name='orders', schema='public')
+    op.drop_index(op.f('ix_public_order_adds_order_id'), table_name='order_adds', schema='public')
+    op.drop_index(op.f('ix_public_drink_adds_drink_id'), table_name='drink_adds', schema='public')
+    op.drop_index(op.f('ix_public_images_drink_id'), table_name='images', schema='public')
+    op.drop_index(op.f('ix_public_drink_sizes_drink_id'), table_name='drink_sizes', schema='public')
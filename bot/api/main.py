@@ -1,6 +1,8 @@
 from fastapi import FastAPI
+from fastapi.responses import PlainTextResponse
 #from api.routes import geocoding
 from api.routes import static_data
+from utils.metrics import read_snapshot, render_prometheus
 
 app = FastAPI(title="Geo API")
 
@@ -8,3 +10,12 @@ app = FastAPI(title="Geo API")
 #app.include_router(geocoding.router)
 
 app.include_router(static_data.router, prefix="/api")
+
+
+@app.get("/metrics", response_class=PlainTextResponse)
+def metrics():
+    """Метрики бота в формате Prometheus (снимок пишет процесс бота, см. utils.metrics)."""
+    return PlainTextResponse(
+        render_prometheus(read_snapshot()),
+        media_type="text/plain; version=0.0.4; charset=utf-8"
+    )
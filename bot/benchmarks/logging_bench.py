@@ -0,0 +1,152 @@
+"""
+Micro-benchmarks for the logging pipeline.
+
+Run from the bot/ directory:
+
+    python -m benchmarks.logging_bench [--records 50000]
+
+Prints records/second for the previous JSONFormatter implementation
+(reproduced below as LegacyJSONFormatter) and the current one, the
+per-call overhead of log_function_call on an async no-op handler, and the
+cost of recording one call in the metrics registry.
+"""
+import argparse
+import asyncio
+import json
+import logging
+import os
+import time
+import traceback
+from datetime import datetime
+
+import utils.logging_config as logging_config
+from utils.logging_config import JSONFormatter, log_function_call, orjson
+from utils.metrics import action_metrics, registry
+
+
+class LegacyJSONFormatter(logging.Formatter):
+    """JSONFormatter as it was before the fast path: kept only for comparison."""
+
+    def format(self, record):
+        log_entry = {
+            'timestamp': datetime.utcnow().isoformat(),
+            'level': record.levelname,
+            'logger': record.name,
+            'message': record.getMessage(),
+            'module': record.module,
+            'function': record.funcName,
+            'line': record.lineno,
+            'process_id': os.getpid(),
+            'thread_id': record.thread,
+        }
+        if record.exc_info:
+            log_entry['exception'] = {
+                'type': record.exc_info[0].__name__ if record.exc_info[0] else None,
+                'message': str(record.exc_info[1]) if record.exc_info[1] else None,
+                'traceback': traceback.format_exception(*record.exc_info)
+            }
+        for key in ('user_id', 'chat_id', 'message_id', 'action', 'execution_time',
+                    'request_id', 'booking_ids', 'callback_data'):
+            if hasattr(record, key):
+                log_entry[key] = getattr(record, key)
+        return json.dumps(log_entry, ensure_ascii=False)
+
+
+def _make_records(count: int):
+    records = []
+    for i in range(count):
+        record = logging.LogRecord(
+            name="handlers.SelectDrinkConversation", level=logging.INFO,
+            pathname=__file__, lineno=42, msg="Заказ %s: пользователь выбрал размер",
+            args=(i,), exc_info=None, func="handle_size_selection",
+        )
+        record.user_id = 123456789
+        record.chat_id = 123456789
+        record.action = "size_selection"
+        record.execution_time = 0.0123
+        records.append(record)
+    return records
+
+
+def bench_formatter(formatter: logging.Formatter, records) -> float:
+    """Records formatted per second."""
+    start = time.perf_counter()
+    for record in records:
+        formatter.format(record)
+    return len(records) / (time.perf_counter() - start)
+
+
+async def _noop(update=None, context=None):
+    return None
+
+
+async def _bench_calls(func, calls: int) -> float:
+    """Average nanoseconds per awaited call."""
+    start = time.perf_counter_ns()
+    for _ in range(calls):
+        await func()
+    return (time.perf_counter_ns() - start) / calls
+
+
+def bench_decorator(calls: int):
+    """Overhead of log_function_call over a bare coroutine, per logger setup."""
+    logger = logging.getLogger(_noop.__module__)
+    logger.propagate = False
+    logger.addHandler(logging.NullHandler())
+
+    async def run():
+        bare = await _bench_calls(_noop, calls)
+        print(f"{'bare coroutine':32} {bare:>12,.0f} ns/call")
+        for title, level, rate in (
+            ("decorated, INFO disabled", logging.WARNING, 1.0),
+            ("decorated, INFO, sampled 10%", logging.INFO, 0.1),
+            ("decorated, INFO, every call", logging.INFO, 1.0),
+        ):
+            logger.setLevel(level)
+            logging_config.DEFAULT_SAMPLE_RATE = rate
+            decorated = log_function_call(action="bench_noop")(_noop)
+            per_call = await _bench_calls(decorated, calls)
+            print(f"{title:32} {per_call:>12,.0f} ns/call (+{per_call - bare:,.0f})")
+
+    asyncio.run(run())
+
+
+def bench_metrics(calls: int):
+    """Per-call metrics recording: by-name lookups vs a bound ActionMetrics."""
+    def by_name():
+        registry.observe("bot_action_duration_seconds", 0.0123, action="bench_metrics")
+        registry.inc("bot_action_calls_total", action="bench_metrics", status="ok")
+
+    bound = action_metrics("bench_metrics")
+    for title, record in (
+        ("metrics, looked up by name", by_name),
+        ("metrics, bound ActionMetrics", lambda: bound.record(0.0123)),
+    ):
+        start = time.perf_counter_ns()
+        for _ in range(calls):
+            record()
+        per_call = (time.perf_counter_ns() - start) / calls
+        print(f"{title:32} {per_call:>12,.0f} ns/call")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--records", type=int, default=50_000)
+    parser.add_argument("--calls", type=int, default=100_000)
+    args = parser.parse_args()
+
+    records = _make_records(args.records)
+    encoder = "orjson" if orjson is not None else "json"
+    for name, formatter in (
+        ("legacy JSONFormatter", LegacyJSONFormatter()),
+        (f"JSONFormatter ({encoder})", JSONFormatter()),
+    ):
+        bench_formatter(formatter, records[:1000])  # warm-up
+        print(f"{name:32} {bench_formatter(formatter, records):>12,.0f} records/s")
+
+    bench_decorator(args.calls)
+    bench_metrics(args.calls)
+
+
+if __name__ == "__main__":
+    main()
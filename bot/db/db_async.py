@@ -1,11 +1,16 @@
 
+from sqlalchemy import event
 from sqlalchemy.orm import sessionmaker, declarative_base
 from sqlalchemy.ext.asyncio import create_async_engine, AsyncSession
+import logging
 import os
+import time
 
 from contextlib import asynccontextmanager
 from typing import AsyncGenerator
 
+from utils.metrics import registry as metrics
+
 POSTGRES_USER = os.getenv("POSTGRES_USER")
 POSTGRES_PASSWORD = os.getenv("POSTGRES_PASSWORD")
 POSTGRES_DB = os.getenv("POSTGRES_DB")
@@ -18,14 +23,82 @@ if not (POSTGRES_USER and POSTGRES_PASSWORD and POSTGRES_DB):
 DATABASE_URL = DATABASE_URL = f"postgresql+asyncpg://{POSTGRES_USER}:{POSTGRES_PASSWORD}@db_meow:{POSTGRES_PORT}/{POSTGRES_DB}"
 
 
+def _env_int(name: str, default: int) -> int:
+    return int(os.getenv(name, default))
+
+
+def _env_bool(name: str, default: bool) -> bool:
+    return os.getenv(name, str(default)).strip().lower() in ("1", "true", "yes", "on")
+
+
+# Профиль движка — всё настраивается через переменные окружения
+DB_ECHO = _env_bool("DB_ECHO", False)                                 # SQL каждого запроса в лог
+DB_POOL_SIZE = _env_int("DB_POOL_SIZE", 10)                           # постоянных соединений
+DB_MAX_OVERFLOW = _env_int("DB_MAX_OVERFLOW", 20)                     # временных сверх пула
+DB_POOL_TIMEOUT = _env_int("DB_POOL_TIMEOUT", 30)                     # сек ожидания свободного соединения
+DB_POOL_RECYCLE = _env_int("DB_POOL_RECYCLE", 1800)                   # сек жизни соединения
+DB_POOL_PRE_PING = _env_bool("DB_POOL_PRE_PING", True)                # проверка соединения перед выдачей
+DB_STATEMENT_CACHE_SIZE = _env_int("DB_STATEMENT_CACHE_SIZE", 500)    # prepared statements asyncpg на соединение
+DB_STATEMENT_TIMEOUT_MS = _env_int("DB_STATEMENT_TIMEOUT_MS", 15000)  # statement_timeout на сервере, 0 — без лимита
+
+# Точечное включение SQL-логов без DB_ECHO: DB_SQL_LOG=sqlalchemy.engine,sqlalchemy.pool
+for _sql_logger in filter(None, (n.strip() for n in os.getenv("DB_SQL_LOG", "").split(","))):
+    logging.getLogger(_sql_logger).setLevel(logging.INFO)
+
 
 # Двигаем SQLAlchemy в async‑режим
 engine = create_async_engine(
     DATABASE_URL,
-    echo=True                # включить SQL‑логгинг
+    echo=DB_ECHO,
+    pool_size=DB_POOL_SIZE,
+    max_overflow=DB_MAX_OVERFLOW,
+    pool_timeout=DB_POOL_TIMEOUT,
+    pool_recycle=DB_POOL_RECYCLE,
+    pool_pre_ping=DB_POOL_PRE_PING,
+    connect_args={
+        # кэш prepared statements asyncpg (используется диалектом SQLAlchemy)
+        "prepared_statement_cache_size": DB_STATEMENT_CACHE_SIZE,
+        "server_settings": {
+            "statement_timeout": str(DB_STATEMENT_TIMEOUT_MS),
+            "application_name": "cofe_bot",
+        },
+    },
 )
 
 
+def _sql_operation(statement: str) -> str:
+    """Первое слово SQL (SELECT/INSERT/UPDATE/WITH/...) — метка для метрик."""
+    head = statement.lstrip().split(None, 1)
+    return head[0].upper() if head else "UNKNOWN"
+
+
+# Время каждого SQL-оператора — в гистограмму bot_db_query_duration_seconds
+@event.listens_for(engine.sync_engine, "before_cursor_execute")
+def _query_started(conn, cursor, statement, parameters, context, executemany):
+    conn.info.setdefault("query_start_ns", []).append(time.perf_counter_ns())
+
+
+@event.listens_for(engine.sync_engine, "after_cursor_execute")
+def _query_finished(conn, cursor, statement, parameters, context, executemany):
+    started = conn.info["query_start_ns"].pop()
+    metrics.observe(
+        "bot_db_query_duration_seconds",
+        (time.perf_counter_ns() - started) / 1e9,
+        operation=_sql_operation(statement),
+    )
+
+
+@event.listens_for(engine.sync_engine, "handle_error")
+def _query_failed(exception_context):
+    conn = exception_context.connection
+    if conn is not None and conn.info.get("query_start_ns"):
+        conn.info["query_start_ns"].pop()
+    metrics.inc(
+        "bot_db_query_errors_total",
+        operation=_sql_operation(exception_context.statement or ""),
+    )
+
+
 # factory для сессий
 async_session_maker = sessionmaker(
     engine,
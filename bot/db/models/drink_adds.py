@@ -7,7 +7,7 @@ class DrinkAdd(Base):
     __table_args__ = {"schema": "public"}
     
     id = Column(Integer, primary_key=True)
-    drink_id = Column(Integer, ForeignKey("public.drinks.id", ondelete="CASCADE"),nullable=False)
+    drink_id = Column(Integer, ForeignKey("public.drinks.id", ondelete="CASCADE"),nullable=False, index=True)
     add_id = Column(Integer, ForeignKey("public.adds.id", ondelete="CASCADE"),nullable=False)
     is_active = Column(Boolean, nullable=False, default=True, server_default=text("true"))
 
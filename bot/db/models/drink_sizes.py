@@ -24,7 +24,7 @@ class DrinkSize(Base):
     __table_args__ = {"schema": "public"}
 
     id = Column(Integer, primary_key=True)
-    drink_id = Column(Integer, ForeignKey("public.drinks.id", ondelete="CASCADE"), nullable=False)
+    drink_id = Column(Integer, ForeignKey("public.drinks.id", ondelete="CASCADE"), nullable=False, index=True)
     size_id = Column(Integer, ForeignKey("public.sizes.id", ondelete="CASCADE"), nullable=False)
     price = Column(Numeric(5,1), nullable=False)
     created_at = Column(DateTime, default=datetime.utcnow)
@@ -18,7 +18,7 @@ class Image(Base):
 
     id = Column(Integer, primary_key=True)
 
-    drink_id = Column(Integer, ForeignKey("public.drinks.id", ondelete="CASCADE"), nullable=False)
+    drink_id = Column(Integer, ForeignKey("public.drinks.id", ondelete="CASCADE"), nullable=False, index=True)
 
     tg_file_id = Column(String, nullable=False)  # идентификатор файла в Telegram
     is_active = Column(Boolean, nullable=False, default=True, server_default=text("true"))  # включено в выдачу
@@ -7,7 +7,7 @@ class OrderAdd(Base):
     __table_args__ = {"schema": "public"}
     
     id = Column(Integer, primary_key=True)
-    order_id = Column(Integer, ForeignKey("public.orders.id", ondelete="RESTRICT"),nullable=False)
+    order_id = Column(Integer, ForeignKey("public.orders.id", ondelete="RESTRICT"),nullable=False, index=True)
     add_id = Column(Integer, ForeignKey("public.adds.id", ondelete="RESTRICT"),nullable=False)
 
     # bidirectional relationship
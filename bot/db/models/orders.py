@@ -19,6 +19,16 @@ class Order(Base):
     __table_args__ = (
         CheckConstraint("drink_count > 0", name="check_drink_count_positive"),
         CheckConstraint("total_price >= 0", name="check_total_price_non_negative"),
+        # просрочка черновиков (utils.order_expiry, check_expired_orders)
+        Index(
+            "ix_orders_draft_updated_at", "updated_at",
+            postgresql_where=text("status_id = 8 AND is_active")
+        ),
+        # последний заказ пользователя (utils.user_session_lastorder.get_last_order)
+        Index(
+            "ix_orders_user_last_order", "tg_user_id", text("created_at DESC"),
+            postgresql_where=text("is_active AND status_id NOT IN (6, 7, 8)")
+        ),
         {"schema": "public"}
     )
 
@@ -41,7 +51,7 @@ class Order(Base):
     customer_comment = Column(String(255), nullable=True)
     manager_comment = Column(String(255), nullable=True)
     is_active = Column(Boolean, nullable=False, default=True, server_default=text("true"))
-    session_id = Column(Integer, ForeignKey("public.sessions.id", ondelete="RESTRICT"),nullable=False)
+    session_id = Column(Integer, ForeignKey("public.sessions.id", ondelete="RESTRICT"),nullable=False, index=True)
 
     # Optional: связи
     user = relationship(
@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, BIGINT, Boolean, DateTime, ForeignKey, text
+from sqlalchemy import Column, Integer, BIGINT, Boolean, DateTime, ForeignKey, Index, text
 from sqlalchemy.orm import relationship
 from sqlalchemy.dialects.postgresql import JSONB
 from datetime import datetime
@@ -6,7 +6,11 @@ from db.db import Base
 
 class Session(Base):
     __tablename__ = "sessions"
-    __table_args__ = {"schema": "public"}
+    __table_args__ = (
+        # поиск живой сессии пользователя (utils.user_session_lastorder.get_or_create_session)
+        Index("ix_sessions_user_active", "tg_user_id", "role_id", postgresql_where=text("is_active")),
+        {"schema": "public"}
+    )
 
     id = Column(Integer, primary_key=True)
     tg_user_id = Column(BIGINT, 
@@ -0,0 +1,93 @@
+"""
+Реестр «горячих» запросов бота.
+
+Каждый запрос собран через lambda_stmt: SQLAlchemy строит и компилирует его
+один раз (кэш по месту определения лямбды), а значения из замыкания
+(order_id, tg_user_id, ...) подставляет как связанные параметры.
+Поэтому в хендлерах не тратится время на сборку select(...).options(...).
+"""
+from sqlalchemy import func, lambda_stmt, select
+from sqlalchemy.orm import joinedload, selectinload
+from sqlalchemy.sql.lambdas import StatementLambdaElement
+
+from db.models import Drink, DrinkSize, Order, OrderAdd
+
+ORDER_STATUS_DRAFT = 8
+
+
+def order_for_take_stmt(order_id: int) -> StatementLambdaElement:
+    """Заказ для менеджера, берущего его в работу: напиток, группа, размер, клиент."""
+    return lambda_stmt(
+        lambda: select(Order)
+        .options(
+            selectinload(Order.drink_size)
+                .selectinload(DrinkSize.drink)
+                .selectinload(Drink.drink_type),
+            selectinload(Order.drink_size).selectinload(DrinkSize.sizes),
+            selectinload(Order.user)
+        )
+        .where(Order.id == order_id)
+    )
+
+
+def order_for_ready_stmt(order_id: int) -> StatementLambdaElement:
+    """Заказ при выдаче: то же, что при взятии в работу, плюс менеджер и сессия."""
+    return lambda_stmt(
+        lambda: select(Order)
+        .options(
+            selectinload(Order.drink_size)
+                .selectinload(DrinkSize.drink)
+                .selectinload(Drink.drink_type),
+            selectinload(Order.drink_size).selectinload(DrinkSize.sizes),
+            selectinload(Order.user),
+            selectinload(Order.manager),
+            selectinload(Order.session)
+        )
+        .where(Order.id == order_id)
+    )
+
+
+def order_for_receive_stmt(order_id: int) -> StatementLambdaElement:
+    """Заказ, который клиент отметил полученным: клиент, менеджер, сессия (last_action)."""
+    return lambda_stmt(
+        lambda: select(Order)
+        .options(
+            selectinload(Order.user),
+            selectinload(Order.manager),
+            selectinload(Order.session)
+        )
+        .where(Order.id == order_id)
+    )
+
+
+def order_for_notification_stmt(order_id: int) -> StatementLambdaElement:
+    """Заказ для уведомления менеджеров об оплате."""
+    return lambda_stmt(
+        lambda: select(Order)
+        .options(
+            joinedload(Order.drink_size).joinedload(DrinkSize.drink).joinedload(Drink.drink_type),
+            joinedload(Order.drink_size).joinedload(DrinkSize.sizes),
+            joinedload(Order.order_adds).joinedload(OrderAdd.add),
+            joinedload(Order.user),
+        )
+        .where(Order.id == order_id)
+    )
+
+
+def draft_state_stmt(order_id: int, tg_user_id: int) -> StatementLambdaElement:
+    """Состояние черновика одной строкой: поля заказа и массив id добавок."""
+    return lambda_stmt(
+        lambda: select(
+            Order.id, Order.session_id, Order.tg_user_id, Order.drink_size_id,
+            Order.drink_count, Order.total_price,
+            func.array_remove(func.array_agg(OrderAdd.add_id), None).label("add_ids")
+        )
+        .outerjoin(OrderAdd, OrderAdd.order_id == Order.id)
+        .where(
+            Order.id == order_id,
+            Order.tg_user_id == tg_user_id,
+            Order.status_id == ORDER_STATUS_DRAFT,
+            Order.is_active == True
+        )
+        .group_by(Order.id)
+    )
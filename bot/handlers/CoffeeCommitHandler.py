@@ -8,6 +8,7 @@ from telegram import (
     InlineKeyboardMarkup
     )
 from utils.logging_config import log_function_call, get_logger
+from utils.menu_catalog import invalidate_menu_catalog, get_menu_catalog
 
 logger = get_logger(__name__)
 
@@ -40,6 +41,10 @@ async def confirm_coffee_callback(update: Update, context: ContextTypes.DEFAULT_
             drink.is_draft = False
             await session.commit()
 
+        # карточка попала в меню — снимок каталога устарел, перечитываем его в фоне
+        invalidate_menu_catalog()
+        context.application.create_task(get_menu_catalog())
+
         confirmation_text = "🏆 Карточка напитка сохранена. Желаю хороших продаж!"
 
         keyboard = [[
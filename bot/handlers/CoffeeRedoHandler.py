@@ -4,6 +4,7 @@ from telegram.ext import ContextTypes, CallbackQueryHandler, ConversationHandler
 from sqlalchemy import update as sa_update
 from telegram import Update
 from utils.logging_config import log_function_call, get_logger
+from utils.menu_catalog import invalidate_menu_catalog, get_menu_catalog
 
 logger = get_logger(__name__)
 
@@ -37,6 +38,10 @@ async def redo_coffee_callback(update: Update, context: ContextTypes.DEFAULT_TYP
             )
             await session.commit()
 
+        # напиток убран из меню — снимок каталога устарел, перечитываем его в фоне
+        invalidate_menu_catalog()
+        context.application.create_task(get_menu_catalog())
+
         # Определяем тип сообщения (текст или фото)
         if message.text:
             await query.edit_message_text(
@@ -19,6 +19,7 @@ from telegram.ext import (
 from sqlalchemy import select, update as sa_update
 from sqlalchemy.orm import joinedload, selectinload
 from db.db_async import get_async_session
+from db.queries import order_for_receive_stmt
 from db.models import Order, Drink, DrinkSize, DrinkAdd, User, OrderAdd
 from utils.logging_config import log_function_call, LogExecutionTime, get_logger
 
@@ -47,13 +48,7 @@ async def order_received_handler(update: Update, context: ContextTypes.DEFAULT_T
 
     async with get_async_session() as session:
         result = await session.execute(
-            select(Order)
-            .options(
-                selectinload(Order.user),       # клиент
-                selectinload(Order.manager),    # менеджер
-                selectinload(Order.session)     # для last_action
-            )
-            .where(Order.id == order_id)
+            order_for_receive_stmt(order_id)
         )
         order = result.scalar_one_or_none()
         if not order:
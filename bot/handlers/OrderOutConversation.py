@@ -19,6 +19,8 @@ from telegram.ext import (
 from sqlalchemy import select, update as sa_update
 from sqlalchemy.orm import joinedload, selectinload
 from db.db_async import get_async_session
+from db.queries import order_for_take_stmt, order_for_ready_stmt
+from utils.identity_cache import get_identity
 from db.models import Order, Drink, DrinkSize, DrinkAdd, User, OrderAdd,Session
 from utils.logging_config import log_function_call, LogExecutionTime, get_logger
 
@@ -52,15 +54,7 @@ async def take_order_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
     async with get_async_session() as session:
         result = await session.execute(
-            select(Order)
-            .options(
-                selectinload(Order.drink_size)
-                    .selectinload(DrinkSize.drink)
-                    .selectinload(Drink.drink_type),
-                selectinload(Order.drink_size).selectinload(DrinkSize.sizes),
-                selectinload(Order.user)    # клиент
-            )
-            .where(Order.id == order_id)
+            order_for_take_stmt(order_id)
         )
         order = result.scalar_one_or_none()
         if not order:
@@ -69,10 +63,7 @@ async def take_order_handler(update: Update, context: ContextTypes.DEFAULT_TYPE)
 
         # Определяем менеджера из callback.from_user
         tg_manager = query.from_user.id
-        manager_result = await session.execute(
-            select(User).where(User.tg_user_id == tg_manager)
-        )
-        manager = manager_result.scalar_one_or_none()
+        manager = await get_identity(tg_manager)
 
         if not manager:
             await query.message.reply_text("❌ Менеджер не найден в базе.")
@@ -133,17 +124,7 @@ async def order_ready_handler(update: Update, context: ContextTypes.DEFAULT_TYPE
 
     async with get_async_session() as session:
         result = await session.execute(
-            select(Order)
-            .options(
-                selectinload(Order.drink_size)
-                    .selectinload(DrinkSize.drink)
-                    .selectinload(Drink.drink_type),
-                selectinload(Order.drink_size).selectinload(DrinkSize.sizes),
-                selectinload(Order.user),     # клиент
-                selectinload(Order.manager),  # менеджер
-                selectinload(Order.session)
-            )
-            .where(Order.id == order_id)
+            order_for_ready_stmt(order_id)
         )
         order = result.scalar_one_or_none()
         if not order:
@@ -11,8 +11,13 @@ from telegram.ext import (
 from sqlalchemy import select, update as sa_update
 from sqlalchemy.orm import joinedload
 from db.db_async import get_async_session
+from db.queries import order_for_notification_stmt
 from db.models import Order, Drink, DrinkSize, DrinkAdd, User, OrderAdd
 from utils.logging_config import log_function_call, LogExecutionTime, get_logger
+from utils.draft_orders import flush_pending_draft, get_draft, forget_draft
+from utils.order_expiry import cancel_order_expiry
+from utils.menu_catalog import get_menu_catalog
+from utils.pricing import format_rub
 
 ORDER_STATUS_PAYED = 2
 
@@ -37,26 +42,27 @@ async def pay_order(update: Update, context: ContextTypes.DEFAULT_TYPE):
 
     order_id = int(query.data.split("_")[1])
 
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(Order).where(Order.id == order_id)
-        )
-        order = result.scalar_one_or_none()
+    # черновик мог ещё не доехать до БД (отложенная запись) — сбрасываем его сейчас
+    draft = await flush_pending_draft(context, order_id)
+    if draft is None:
+        draft = await get_draft(context, order_id, query.from_user.id)
 
-    if not order:
+    if not draft:
         await query.message.reply_text("❌ Заказ не найден")
         return
 
-    # Telegram принимает цену в минимальных единицах (копейки)
-    prices = [LabeledPrice("Кофе", int(order.total_price * 100))]
+    # Сумма считается по прайсу, в копейках — Telegram принимает цену в минимальных единицах
+    catalog = await get_menu_catalog()
+    amount = catalog.prices.order_total(draft.drink_size_id, draft.drink_count, draft.add_ids)
+    prices = [LabeledPrice("Кофе", amount)]
 
     await query.message.reply_invoice(
         title="Оплата кофе",
-        description=f"Заказ #{order.id}",
+        description=f"Заказ #{order_id}",
         provider_token=PAYMENT_TOKEN,
         currency="RUB",
         prices=prices,
-        payload=str(order.id),  # прокидываем id заказа
+        payload=str(order_id),  # прокидываем id заказа
         start_parameter="coffee-payment",
     )
 
@@ -74,6 +80,10 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
     payment = update.message.successful_payment
     order_id = int(payment.invoice_payload)
 
+    # заказ оплачен: таймер просрочки и копия черновика в памяти больше не нужны
+    cancel_order_expiry(context.job_queue, order_id)
+    forget_draft(context.user_data, order_id)
+
     async with get_async_session() as session:
         # Обновляем статус
         await session.execute(
@@ -85,14 +95,7 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
 
         # Достаём заказ с деталями
         result = await session.execute(
-            select(Order)
-            .options(
-                joinedload(Order.drink_size).joinedload(DrinkSize.drink).joinedload(Drink.drink_type),
-                joinedload(Order.drink_size).joinedload(DrinkSize.sizes),
-                joinedload(Order.order_adds).joinedload(OrderAdd.add),
-                joinedload(Order.user),
-            )
-            .where(Order.id == order_id)
+            order_for_notification_stmt(order_id)
         )
         order = result.scalars().first()
 
@@ -108,7 +111,7 @@ async def successful_payment_handler(update: Update, context: ContextTypes.DEFAU
         f"📏 Размер: {order.drink_size.sizes.name}\n"
         f"🔢 Количество: {order.drink_count}\n"
         f"➕ Добавки: {adds_text}\n"
-        f"💰 Оплачено: {order.total_price} ₽\n"
+        f"💰 Оплачено: {format_rub(payment.total_amount)} ₽\n"
         f"⏰ Создан: {created_local.strftime('%H:%M %d.%m.%Y')}\n"
         f"💬 Комментарий клиента: {order.customer_comment or '—'}\n"
         f"😺: {order.user.firstname or order.user.username}"
@@ -24,8 +24,9 @@ from db.models.drinks import Drink
 from db.models.orders import Order
 
 
-from utils.user_session_lastorder import get_user_by_tg_id, create_user, create_session, get_last_order
+from utils.user_session_lastorder import get_user_by_tg_id, create_user, resolve_session_id, get_last_order
 from utils.escape import safe_html
+from utils.identity_cache import MANAGER_LIST
 
 from utils.logging_config import log_function_call, LogExecutionTime, get_logger
 
@@ -34,10 +35,6 @@ import os
 
 logger = get_logger(__name__)
 
-MANAGER_LIST = [
-    int(m.strip(" []")) for m in os.getenv("MANAGER_ID_LIST", "").split(",") if m.strip(" []")
-]
-
 MENU_URL = ["/bot/static/images/menu_1.png", "/bot/static/images/menu_2.png"]
 WELCOME_PHOTO = "/bot/static/images/pelmeshek_avatar.png"
 
@@ -112,7 +109,7 @@ async def handle_registration(update: Update, context: ContextTypes.DEFAULT_TYPE
         return ConversationHandler.END
 
 async def route_after_login(update: Update, context: ContextTypes.DEFAULT_TYPE, user):
-    """Роутинг после регистрации или входа с созданием сессии"""
+    """Роутинг после регистрации или входа с привязкой к сессии"""
     print(f"DEBUG: user_id = {user.tg_user_id}\n"
           f"MANAGER_LIST = {MANAGER_LIST}")
     try:
@@ -121,14 +118,14 @@ async def route_after_login(update: Update, context: ContextTypes.DEFAULT_TYPE,
         else:
             role_id = 1
 
-        # Создаём сессию
-        session = await create_session(user.tg_user_id, role_id)
+        # Переиспользуем активную сессию; новая создаётся только после простоя
+        session_id = await resolve_session_id(context.user_data, user.tg_user_id, role_id)
 
         # Сохраняем данные сессии
         context.user_data.update({
             "user_id": user.id,
             "tg_user_id": user.tg_user_id,
-            "session_id": session.id,
+            "session_id": session_id,
             "role_id": role_id
         })
 
@@ -163,22 +160,22 @@ async def show_customer_menu(update: Update, context: ContextTypes.DEFAULT_TYPE,
 
     if last_order:
         keyboard = [
-            [InlineKeyboardButton("Повторить", callback_data=f"select_size_{last_order['drink_size_id']}"),
+            [InlineKeyboardButton("Повторить", callback_data=f"select_size_{last_order.drink_size_id}"),
              InlineKeyboardButton("Новый заказ", callback_data="new_order")],
             [InlineKeyboardButton("Показать меню", callback_data="show_menu")]
         ]
         caption = (
             f"Ваш предыдущий заказ:\n\n"
-            f"• <b>{last_order['drink_name']}</b>\n"
-            f"• Версия: {last_order['size']}\n"
-            f"• Количество: {last_order['drink_count']}\n"
-            f"• Цена: {last_order['total_price']}₽\n"
-            f"• Дата: {last_order['created_at'].strftime('%d.%m.%Y')}\n\n"
+            f"• <b>{last_order.drink_name}</b>\n"
+            f"• Версия: {last_order.size}\n"
+            f"• Количество: {last_order.drink_count}\n"
+            f"• Цена: {last_order.total_price}₽\n"
+            f"• Дата: {last_order.created_at.strftime('%d.%m.%Y')}\n\n"
             f"Что будем делать?"
         )
-        if last_order["image_file_id"]:
+        if last_order.image_file_id:
             await update.effective_message.reply_photo(
-                photo=last_order["image_file_id"],
+                photo=last_order.image_file_id,
                 caption=caption,
                 reply_markup=InlineKeyboardMarkup(keyboard),
                 parse_mode="HTML"
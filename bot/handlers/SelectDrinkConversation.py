@@ -10,9 +10,15 @@ from sqlalchemy.orm import selectinload
 from utils.logging_config import log_function_call, LogExecutionTime, get_logger
 from db.db_async import get_async_session
 from db.models import Drink, DrinkType, DrinkSize, DrinkAdd, Order, OrderAdd, Add, Session
-from sqlalchemy import select
+from sqlalchemy import select, insert
 from datetime import datetime
-from utils.keyboard_builder import get_drink_sizes_keyboard, build_order_keyboard
+from utils.keyboard_builder import build_order_keyboard
+from utils.menu_catalog import get_menu_catalog
+from utils.drink_cards_view import send_drink_cards
+from utils.message_cleanup import schedule_delete_messages
+from utils.draft_orders import DraftOrder, remember_draft, get_draft, schedule_draft_flush
+from utils.pricing import format_rub, to_rubles
+from utils.order_expiry import schedule_order_expiry
 
 # Состояния
 (
@@ -34,6 +40,22 @@ ORDER_STATUS_DECLINED = 6
 ORDER_STATUS_EXPIRED = 7
 ORDER_STATUS_DRAFT = 8
 
+def _order_caption(drink_name: str, drink_size, unit_kopecks: int, drink_count: int, add_names: list[str]) -> str:
+    """Текст карточки заказа (одинаковый для выбора размера, количества и добавок)."""
+    return f"<b>{drink_name}</b>\n" \
+           f"☕🍦☕🐈☕🍦☕🐈☕🍦☕🐈☕🍦\n" \
+           f"{drink_size.size_name} ({drink_size.volume_ml} мл) – {format_rub(unit_kopecks)}₽\n" \
+           f"Количество: {drink_count}\n" \
+           f"Добавки: {', '.join(add_names) if add_names else 'не выбрано'}"
+
+def _cleanup_menu_messages(update: Update, context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Убрать карточки напитков и сообщение "Отличный выбор! ..." (удаление идёт в фоне)."""
+    msg_ids = context.user_data.get("drink_messages", [])
+    last_menu_msg_id = context.user_data.get("last_menu_message_id")
+    schedule_delete_messages(context, update.effective_chat.id, [*msg_ids, last_menu_msg_id])
+    context.user_data["drink_messages"] = []
+    context.user_data["last_menu_message_id"] = None
+
 @log_function_call(action="Start_order_session")
 async def start_select_drink(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """
@@ -47,31 +69,10 @@ async def start_select_drink(update: Update, context: ContextTypes.DEFAULT_TYPE)
     else:
         msg_target = update.message
     #удаляет предыдущий вариант показа карточек выбранного типа, если гость нажал на Вернуться.
-    chat_id = update.effective_chat.id
-    msg_ids = context.user_data.get("drink_messages", [])
-    print(f"DEBUG_delete_MESSAGE_list: {msg_ids}")
-    if msg_ids:
-        for msg_id in msg_ids:
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-            except Exception as e:
-                print(f"Не удалось удалить сообщение {msg_id}: {e}")
-    context.user_data["drink_messages"] = []
-        # удаляем сообщение с текстом "Отличный выбор! ..."
-    last_menu_msg_id = context.user_data.get("last_menu_message_id")
-    print(f"DEBUG_delete_GREETINGS: {last_menu_msg_id}")
-    if last_menu_msg_id:
-        try:
-            await context.bot.delete_message(chat_id=chat_id, message_id=last_menu_msg_id)
-        except Exception as e:
-            print(f"Не удалось удалить сообщение {last_menu_msg_id}: {e}")
-        context.user_data["last_menu_message_id"] = None
-    # Получаем все активные типы напитков
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(DrinkType)
-        )
-        types = result.scalars().all()
+    _cleanup_menu_messages(update, context)
+    # Типы напитков берём из снимка меню (без обращения к БД)
+    catalog = await get_menu_catalog()
+    types = catalog.types
 
     if not types:
         await msg_target.reply_text("❌ В данный момент нет доступных категорий напитков.")
@@ -97,11 +98,8 @@ async def handle_drinktype_selection(update: Update, context: ContextTypes.DEFAU
     type_id = int(query.data.split("_")[-1])
     context.user_data["drink_type_id"] = type_id
 
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(DrinkType).where(DrinkType.id == type_id)
-        )
-        drink_type = result.scalar_one_or_none()
+    catalog = await get_menu_catalog()
+    drink_type = catalog.get_type(type_id)
 
     type_name = drink_type.name if drink_type else "Неизвестная категория"
 
@@ -117,40 +115,16 @@ async def handle_drinktype_selection(update: Update, context: ContextTypes.DEFAU
 async def show_filtered_drinks(update: Update, context: ContextTypes.DEFAULT_TYPE):
     type_id = context.user_data.get("drink_type_id")
 
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(Drink)
-            .where(Drink.type_id == type_id, Drink.is_active == True, Drink.is_draft == False)
-        )
-        drinks = result.scalars().all()
+    catalog = await get_menu_catalog()
+    drinks = catalog.get_drinks(type_id)
 
     if not drinks:
         await update.effective_message.reply_text("❌ В этой категории пока нет напитков.")
         return ConversationHandler.END
 
-    context.user_data["drink_messages"] = []  # сбрасываем перед показом
-
-    for drink in drinks:
-        # Получаем размеры и клавиатуру
-        sizes, keyboard_markup, image_file_id = await get_drink_sizes_keyboard(drink.id)
-
-        caption = f"<b>{drink.name}</b>\n{drink.description or 'Без описания'}"
-
-        if image_file_id:
-            sent = await update.effective_message.reply_photo(
-                photo=image_file_id,
-                caption=caption,
-                reply_markup=keyboard_markup,
-                parse_mode="HTML"
-            )
-        else:
-            sent = await update.effective_message.reply_text(
-                caption,
-                reply_markup=keyboard_markup,
-                parse_mode="HTML"
-            )
-            # сохраняем id отправленного сообщения
-        context.user_data["drink_messages"].append(sent.message_id)
+    # Карточки отправляются одним пакетом: мелкие категории — по карточке,
+    # крупные — альбомом и общей клавиатурой (см. utils.drink_cards_view)
+    context.user_data["drink_messages"] = await send_drink_cards(update.effective_message, drinks)
     return SELECT_SIZE
 
 @log_function_call(action="size_selection")
@@ -171,89 +145,114 @@ async def handle_size_selection(update: Update, context: ContextTypes.DEFAULT_TY
         context.user_data["selected_size_id"] = drink_size_id
         tg_user_id = update.effective_user.id
 
+        # размер, напиток и его добавки — из снимка меню, без запросов в БД
+        catalog = await get_menu_catalog()
+        drink_size = catalog.drink_sizes.get(drink_size_id)
+        if not drink_size:
+            # размер снят с продажи (например, «Повторить» для удалённого напитка)
+            await query.message.reply_text(
+                "😿 Этот напиток сейчас недоступен. Выберите другой.",
+                reply_markup=InlineKeyboardMarkup(
+                    [[InlineKeyboardButton("🆕 Новый заказ", callback_data="new_order")]]
+                )
+            )
+            return ConversationHandler.END
+        drink = catalog.drinks[drink_size.drink_id]
+        unit_kopecks = catalog.prices.drink_size_price(drink_size.id)
+
         async with get_async_session() as session:
             session_id = context.user_data.get("session_id")
 
             if not session_id:
-                # создаём новую сессию
-                new_session = Session(tg_user_id=tg_user_id, role_id = 1,last_action={"event": "order_started"})
-                session.add(new_session)
-                await session.flush()  # получаем id новой сессии
-                session_id = new_session.id
+                # создаём новую сессию (редкий путь: нет /start в текущем контексте)
+                session_id = (await session.execute(
+                    insert(Session)
+                    .values(tg_user_id=tg_user_id, role_id=1, last_action={"event": "order_started"})
+                    .returning(Session.id)
+                )).scalar_one()
                 context.user_data["session_id"] = session_id  # кладём обратно в контекст
-                # получаем размер напитка вместе с его Drink и Size
-            result = await session.execute(
-                select(DrinkSize)
-                .options(
-                    selectinload(DrinkSize.drink).selectinload(Drink.drink_adds).selectinload(DrinkAdd.add),  # грузим добавки сразу
-                    selectinload(DrinkSize.sizes)
-                )
-                .where(DrinkSize.id == drink_size_id)
-            )
-            drink_size = result.scalar_one()
-
-            # создаём заказ (draft)
-            order = Order(
-                tg_user_id=tg_user_id,
-                drink_size_id=drink_size.id,
-                status_id= ORDER_STATUS_DRAFT,
-                drink_count=1,
-                total_price=drink_size.price,
-                session_id = session_id if session_id else 1
-            )
-            session.add(order)
-            await session.flush()  # чтобы получить order.id
 
-            adds = [drink_add.add for drink_add in drink_size.drink.drink_adds]
+            # создаём заказ (draft) одним INSERT ... RETURNING
+            order_id = (await session.execute(
+                insert(Order)
+                .values(
+                    tg_user_id=tg_user_id,
+                    drink_size_id=drink_size.id,
+                    status_id=ORDER_STATUS_DRAFT,
+                    drink_count=1,
+                    total_price=to_rubles(unit_kopecks),
+                    session_id=session_id
+                )
+                .returning(Order.id)
+            )).scalar_one()
+            # коммитим до запроса к Bot API: соединение не ждёт ответа Telegram
+            await session.commit()
 
-            selected_adds = []
-            keyboard = await build_order_keyboard(order, adds, selected_adds, order.total_price)
+        # таймер — сразу после коммита: черновик просрочится, даже если ответ ниже упадёт
+        schedule_order_expiry(context.job_queue, order_id, tg_user_id)
 
-            caption = f"<b>{drink_size.drink.name}</b>\n" \
-                    f"☕🍦☕🐈☕🍦☕🐈☕🍦☕🐈☕🍦\n" \
-                    f"{drink_size.sizes.name} ({drink_size.sizes.volume_ml} мл) – {int(drink_size.price)}₽\n" \
-                    f"Количество: 1\n" \
-                    f"Добавки: не выбрано"
+        keyboard = await build_order_keyboard(order_id, 1, drink.adds, [], unit_kopecks)
+        caption = _order_caption(drink.name, drink_size, unit_kopecks, 1, [])
 
-            msg = await update.callback_query.message.reply_text(
-                caption, reply_markup=keyboard, parse_mode="HTML"
-            )
-            # сохраняем id сообщения в сессию
-            session_obj = await session.get(Session, session_id)
-            if session_obj:
-                session_obj.last_action = {
-                    "event": "order_message",
-                    "message_id": msg.message_id
-                }
+        msg = await update.callback_query.message.reply_text(
+            caption, reply_markup=keyboard, parse_mode="HTML"
+        )
 
-            await session.commit()
+        # дальше количество и добавки меняются в памяти (см. utils.draft_orders);
+        # id сообщения попадёт в sessions.last_action с отложенной записью черновика
+        draft = DraftOrder(
+            order_id=order_id,
+            session_id=session_id,
+            tg_user_id=tg_user_id,
+            drink_size_id=drink_size.id,
+            total_kopecks=unit_kopecks,
+        )
+        draft.touch("order_message", msg.message_id)
+        remember_draft(context, draft)
+        schedule_draft_flush(context, draft)
 
-        chat_id = update.effective_chat.id
-
-        for msg_id in context.user_data.get("drink_messages", []):
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=msg_id)
-            except Exception as e:
-                print(f"Не удалось удалить сообщение {msg_id}: {e}")
-        # очищаем список
-        context.user_data["drink_messages"] = []
-
-        last_menu_msg_id = context.user_data.get("last_menu_message_id")
-        if last_menu_msg_id:
-            try:
-                await context.bot.delete_message(chat_id=chat_id, message_id=last_menu_msg_id)
-            except Exception as e:
-                print(f"Не удалось удалить сообщение {last_menu_msg_id}: {e}")
-        # очищаем список
-        context.user_data["last_menu_message_id"] = None
+        # карточки меню больше не нужны — удаляем их в фоне
+        _cleanup_menu_messages(update, context)
         return SELECT_ADDS
 
 
+async def _load_draft_view(query, context: ContextTypes.DEFAULT_TYPE, order_id: int):
+    """Черновик и его позиция в меню; None, если продолжать нельзя (пользователь уже уведомлён)."""
+    draft = await get_draft(context, order_id, query.from_user.id)
+    if not draft:
+        await query.message.edit_text("Заказ не найден. Начните сначала.")
+        return None
+
+    catalog = await get_menu_catalog()
+    drink_size = catalog.drink_sizes.get(draft.drink_size_id)
+    if not drink_size:
+        await query.message.edit_text("😿 Этот напиток сейчас недоступен. Начните сначала.")
+        return None
+    return draft, catalog.drinks[drink_size.drink_id], drink_size, catalog.prices
+
+
+async def _redraw_draft(query, context: ContextTypes.DEFAULT_TYPE, draft, drink, drink_size, prices, event: str):
+    """Пересчитать цену, перерисовать карточку заказа и отложить запись в БД."""
+    # пересчёт цены по прайсу: напиток × количество + добавки
+    draft.total_kopecks = prices.order_total(draft.drink_size_id, draft.drink_count, draft.add_ids)
+    draft.touch(event, query.message.message_id)
+
+    add_names = [a.name for a in drink.adds if a.id in draft.add_ids]
+    keyboard = await build_order_keyboard(draft.order_id, draft.drink_count, drink.adds, draft.add_ids, draft.total_kopecks)
+    caption = _order_caption(
+        drink.name, drink_size, prices.drink_size_price(drink_size.id), draft.drink_count, add_names
+    )
+    await query.message.edit_text(caption, reply_markup=keyboard, parse_mode="HTML")
+
+    schedule_draft_flush(context, draft)
+    # черновик живёт ORDER_EXPIRE_AFTER с последнего изменения
+    schedule_order_expiry(context.job_queue, draft.order_id, draft.tg_user_id)
+
+
 @log_function_call(action="update_quantity")
 async def handle_update_quantity(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
-    print(f"DEBUG_quantity_data: {query.data.split("_")}")
     try:
         _,_, action, order_id_str = query.data.split("_")
         order_id = int(order_id_str)
@@ -261,70 +260,29 @@ async def handle_update_quantity(update: Update, context: ContextTypes.DEFAULT_T
         await query.message.reply_text("Ошибка при изменении количества.")
         return SELECT_ADDS
 
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(Order)
-            .options(
-                selectinload(Order.drink_size)
-                    .selectinload(DrinkSize.drink)
-                    .selectinload(Drink.drink_adds)
-                    .selectinload(DrinkAdd.add),  # добавки сразу грузим
-                selectinload(Order.order_adds).selectinload(OrderAdd.add),  # выбранные пользователем добавки
-                selectinload(Order.drink_size).selectinload(DrinkSize.sizes),
-                selectinload(Order.session)
-            )
-            .where(Order.id == order_id)
-        )
-        order = result.scalar_one_or_none()
-
-        if not order:
-            await query.message.edit_text("Заказ не найден. Начните сначала.")
-            return ConversationHandler.END
+    view = await _load_draft_view(query, context, order_id)
+    if not view:
+        return ConversationHandler.END
+    draft, drink, drink_size, prices = view
 
+    # изменение, не допускать меньше 1
+    if not draft.change_count(1 if action == "+" else -1):
+        # если попытка уменьшить ниже 1 — просто игнорируем
+        logger.debug("Attempt to decrease below 1 ignored for order %s", order_id)
+        return SELECT_ADDS
 
-        # изменение, не допускать меньше 1
-        if action == "+":
-            order.drink_count += 1
-        elif action == "-" and order.drink_count > 1:
-            order.drink_count -= 1
-        else:
-            # если попытка уменьшить ниже 1 — просто игнорируем
-            logger.debug("Attempt to decrease below 1 ignored for order %s", order_id)
-
-        # пересчёт цены: напиток + добавки
-        current_adds = [oa.add for oa in order.order_adds]
-        order.total_price = order.drink_size.price * order.drink_count + sum(a.price for a in current_adds)
-
-        await session.flush()
-
-        # пересобираем клавиатуру
-        adds = [oa.add for oa in order.order_adds]  # выбранные добавки
-        available_adds = [da.add for da in order.drink_size.drink.drink_adds]
-        selected_adds = [oa.add_id for oa in order.order_adds]
-        keyboard = await build_order_keyboard(order, available_adds, selected_adds, order.total_price)
-
-        caption = f"<b>{order.drink_size.drink.name}</b>\n" \
-                  f"☕🍦☕🐈☕🍦☕🐈☕🍦☕🐈☕🍦\n" \
-                  f"{order.drink_size.sizes.name} ({order.drink_size.sizes.volume_ml} мл) – {int(order.drink_size.price)}₽\n" \
-                  f"Количество: {order.drink_count}\n" \
-                  f"Добавки: {', '.join([a.name for a in adds]) if adds else 'не выбрано'}"
-
-        await query.message.edit_text(caption, reply_markup=keyboard, parse_mode="HTML")
-        
-        session_obj = await session.get(Session, order.session_id)
-        if session_obj:
-            session_obj.last_action = {
-                "event": "update_quantity",
-                "message_id": query.message.message_id
-            }
-        await session.commit()
+    await _redraw_draft(query, context, draft, drink, drink_size, prices, event="update_quantity")
     return SELECT_ADDS
 
 @log_function_call(action="toggle_add")
 async def handle_toggle_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Включить/выключить добавку в черновике.
+    SQL на нажатие: 0 (черновик в памяти) или 1 SELECT при промахе;
+    запись в БД — один оператор на серию нажатий (utils.draft_orders.flush_draft).
+    """
     query = update.callback_query
     await query.answer()
-    print(f"DEBUG_toggle_add_data: {query.data.split("_")}")
     try:
         _,_, add_id_str, order_id_str = query.data.split("_")
         order_id = int(order_id_str)
@@ -333,58 +291,18 @@ async def handle_toggle_add(update: Update, context: ContextTypes.DEFAULT_TYPE):
         await query.message.reply_text("Ошибка выбора добавки.")
         return SELECT_ADDS
 
-    async with get_async_session() as session:
-    # получаем заказ и связанные объекты
-        result = await session.execute(
-            select(Order)
-            .options(
-                selectinload(Order.order_adds).selectinload(OrderAdd.add),
-                selectinload(Order.drink_size).selectinload(DrinkSize.drink).selectinload(Drink.drink_adds).selectinload(DrinkAdd.add),
-                selectinload(Order.drink_size).selectinload(DrinkSize.sizes),
-                selectinload(Order.session)
-            )
-            .where(Order.id == order_id)
-        )
-        order = result.scalar_one_or_none()
-        if not order:
-            await query.message.edit_text("Заказ не найден. Начните сначала.")
-            return ConversationHandler.END
+    view = await _load_draft_view(query, context, order_id)
+    if not view:
+        return ConversationHandler.END
+    draft, drink, drink_size, prices = view
+
+    # переключаем добавку (только из доступных для этого напитка)
+    if not any(a.id == add_id for a in drink.adds):
+        logger.debug("Add %s is not available for order %s", add_id, order_id)
+        return SELECT_ADDS
+    draft.toggle_add(add_id)
 
-        # переключаем добавку
-        existing = next((oa for oa in order.order_adds if oa.add_id == add_id), None)
-        if existing:
-            await session.delete(existing)
-        else:
-            order_add = OrderAdd(order_id=order.id, add_id=add_id)
-            session.add(order_add)
-
-        await session.flush()
-        await session.refresh(order)  # гарантируем актуальность order.order_adds
-
-        # пересчёт цены
-        current_adds = [oa.add for oa in order.order_adds]
-        order.total_price = order.drink_size.price * order.drink_count + sum(a.price for a in current_adds)
-
-        await session.flush()
-
-        selected_adds = [oa.add_id for oa in order.order_adds]
-        available_adds = [da.add for da in order.drink_size.drink.drink_adds]
-        keyboard = await build_order_keyboard(order, available_adds, selected_adds, order.total_price)
-
-        caption = f"☕ <b>{order.drink_size.drink.name}</b>\n" \
-                    f"☕🍦☕🐈☕🍦☕🐈☕🍦☕🐈☕🍦\n" \
-                  f"{order.drink_size.sizes.name} ({order.drink_size.sizes.volume_ml} мл) – {int(order.drink_size.price)}₽\n" \
-                  f"Количество: {order.drink_count}\n" \
-                  f"Добавки: {', '.join([oa.add.name for oa in order.order_adds]) if order.order_adds else 'не выбрано'}"
-
-        await query.message.edit_text(caption, reply_markup=keyboard, parse_mode="HTML")
-        session_obj = await session.get(Session, order.session_id)
-        if session_obj:
-            session_obj.last_action = {
-                "event": "update_toggle_adds",
-                "message_id": query.message.message_id
-            }
-        await session.commit()
+    await _redraw_draft(query, context, draft, drink, drink_size, prices, event="update_toggle_adds")
     return SELECT_ADDS
 
 
@@ -16,6 +16,7 @@ from handlers.GetOrderConversationHandler import order_received_handler
 
 from db_monitor import check_db
 from check_expired_orders import check_expired_order
+from utils.order_expiry import restore_order_expiry_jobs, EXPIRY_SWEEP_INTERVAL
 
 import os
 from pathlib import Path
@@ -23,6 +24,9 @@ from datetime import time
 
 from utils.logging_config import setup_logging, log_function_call, get_logger
 from utils.call_coffe_size import init_size_map
+from utils.menu_catalog import init_menu_catalog
+from utils.metrics import dump_metrics_job, METRICS_DUMP_INTERVAL
+from utils.telegram_request import TimedHTTPXRequest
 
 import os
 
@@ -68,15 +72,29 @@ async def post_init(application: Application) -> None:
 
     logger.info("SIZE_MAP успешно инициализирован")
 
+    # Снимок меню для сценария выбора напитков
+    await init_menu_catalog()
+
     application.job_queue.run_repeating(
         check_db,
         interval=30 * 60,
         first=10
     )
+    # Просрочка черновиков: у каждого свой таймер (utils.order_expiry).
+    # После рестарта восстанавливаем таймеры; редкий обход добирает черновики,
+    # просроченные без бота или оставшиеся без таймера.
+    await restore_order_expiry_jobs(application)
     application.job_queue.run_repeating(
-    check_expired_order,
-    interval=30 * 60,
-    first=6
+        check_expired_order,
+        interval=EXPIRY_SWEEP_INTERVAL,
+        first=6
+    )
+
+    # Снимок метрик для /metrics (api/main.py — отдельный процесс)
+    application.job_queue.run_repeating(
+        dump_metrics_job,
+        interval=METRICS_DUMP_INTERVAL,
+        first=METRICS_DUMP_INTERVAL
     )
 
 def main():
@@ -85,7 +103,14 @@ def main():
         raise ValueError("BOT_TOKEN is not set in .env")
 
 
-    app = ApplicationBuilder().token(BOT_TOKEN).post_init(post_init).build()
+    app = (
+        ApplicationBuilder()
+        .token(BOT_TOKEN)
+        # длительность вызовов Bot API -> метрики (long polling getUpdates не учитываем)
+        .request(TimedHTTPXRequest(connection_pool_size=256))
+        .post_init(post_init)
+        .build()
+    )
 
     #глобальные обработчики
     app.add_handler(CommandHandler("info",info_command), group=0)
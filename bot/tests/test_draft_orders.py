@@ -0,0 +1,87 @@
+"""
+Сколько SQL-операторов стоит черновик заказа.
+
+Нажатия ➕/➖ и добавок правят черновик в памяти, запись в БД — один оператор
+на flush_draft. Тест считает операторы слушателем before_cursor_execute
+на движке бота, поэтому нужна настоящая БД (те же POSTGRES_* переменные,
+что и у бота). Запуск из каталога bot/:
+
+    python -m pytest tests
+"""
+import asyncio
+import os
+
+import pytest
+
+pytest.importorskip("sqlalchemy")
+pytest.importorskip("asyncpg")
+pytest.importorskip("telegram")
+
+if not (os.getenv("POSTGRES_USER") and os.getenv("POSTGRES_PASSWORD") and os.getenv("POSTGRES_DB")):
+    pytest.skip("Postgres credentials are not set", allow_module_level=True)
+
+from sqlalchemy import event
+
+from db.db_async import engine
+from utils.draft_orders import DraftOrder, flush_draft
+
+# Заказа с таким id нет: CTE отрабатывает целиком, но ничего не меняет
+MISSING_ORDER_ID = -1
+
+
+def _count_statements(coro_factory):
+    statements = []
+
+    def _on_execute(conn, cursor, statement, parameters, context, executemany):
+        statements.append(statement)
+
+    async def run():
+        event.listen(engine.sync_engine, "before_cursor_execute", _on_execute)
+        try:
+            await coro_factory(statements)
+        finally:
+            event.remove(engine.sync_engine, "before_cursor_execute", _on_execute)
+            await engine.dispose()
+
+    asyncio.run(run())
+    return statements
+
+
+def _draft() -> DraftOrder:
+    return DraftOrder(
+        order_id=MISSING_ORDER_ID,
+        session_id=MISSING_ORDER_ID,
+        tg_user_id=0,
+        drink_size_id=1,
+        total_kopecks=25000,
+        message_id=1,
+    )
+
+
+def test_toggles_cost_no_statements_and_flush_costs_one():
+    async def scenario(statements):
+        draft = _draft()
+        draft.toggle_add(1)
+        draft.touch("toggle_add", 1)
+        draft.toggle_add(2)
+        draft.touch("toggle_add", 1)
+        draft.change_count(+1)
+        draft.touch("change_count", 1)
+        assert statements == []
+
+        await flush_draft(draft)
+        assert len(statements) == 1
+
+    _count_statements(scenario)
+
+
+def test_clean_draft_flush_costs_nothing():
+    async def scenario(statements):
+        draft = _draft()
+        draft.toggle_add(1)
+        draft.touch("toggle_add", 1)
+        await flush_draft(draft)
+        await flush_draft(draft)  # изменений с прошлой записи нет
+        assert len(statements) == 1
+
+    _count_statements(scenario)
@@ -0,0 +1,225 @@
+import asyncio
+import os
+from dataclasses import dataclass, field
+from datetime import datetime
+from typing import Dict, List, Optional
+
+from sqlalchemy import text, bindparam, Integer
+from sqlalchemy.dialects.postgresql import ARRAY, JSONB
+from telegram.ext import ContextTypes
+
+from db.db_async import get_async_session
+from db.queries import draft_state_stmt
+from utils.logging_config import get_logger
+from utils.pricing import to_kopecks, to_rubles
+
+logger = get_logger(__name__)
+
+ORDER_STATUS_DRAFT = 8
+
+# Через сколько секунд после последнего нажатия черновик сбрасывается в БД
+DRAFT_FLUSH_DELAY = float(os.getenv("DRAFT_FLUSH_DELAY", "5"))
+
+DRAFTS_KEY = "draft_orders"
+
+
+@dataclass
+class DraftOrder:
+    """
+    Черновик заказа в памяти (context.user_data["draft_orders"][order_id]).
+    Меняет его только владелец, поэтому ➕/➖ и добавки правятся здесь,
+    а в orders/order_adds состояние попадает отложенно (flush_draft).
+
+    Запросов к БД на одно нажатие: 0, если черновик в памяти;
+    1 SELECT, если его пришлось поднять из БД (например, после рестарта).
+    """
+    order_id: int
+    session_id: int
+    tg_user_id: int
+    drink_size_id: int
+    drink_count: int = 1
+    add_ids: List[int] = field(default_factory=list)
+    total_kopecks: int = 0
+    message_id: Optional[int] = None
+    last_event: str = "order_message"
+    revision: int = 0           # растёт при каждом изменении
+    flushed_revision: int = 0   # ревизия, записанная в БД
+    flush_lock: asyncio.Lock = field(default_factory=asyncio.Lock, repr=False, compare=False)
+
+    @property
+    def dirty(self) -> bool:
+        return self.revision != self.flushed_revision
+
+    def touch(self, event: str, message_id: Optional[int]) -> None:
+        """Отметить изменение: какое действие и в каком сообщении его сделали."""
+        self.last_event = event
+        self.message_id = message_id
+        self.revision += 1
+
+    def toggle_add(self, add_id: int) -> None:
+        if add_id in self.add_ids:
+            self.add_ids.remove(add_id)
+        else:
+            self.add_ids.append(add_id)
+
+    def change_count(self, delta: int) -> bool:
+        """Изменить количество (не меньше 1). Возвращает False, если ничего не изменилось."""
+        new_count = self.drink_count + delta
+        if new_count < 1:
+            return False
+        self.drink_count = new_count
+        return True
+
+
+def _drafts(user_data: dict) -> Dict[int, DraftOrder]:
+    return user_data.setdefault(DRAFTS_KEY, {})
+
+
+def remember_draft(context: ContextTypes.DEFAULT_TYPE, draft: DraftOrder) -> None:
+    _drafts(context.user_data)[draft.order_id] = draft
+
+
+def forget_draft(user_data: dict, order_id: int) -> Optional[DraftOrder]:
+    return _drafts(user_data).pop(order_id, None)
+
+
+async def _load_draft(order_id: int, tg_user_id: int) -> Optional[DraftOrder]:
+    """Поднять черновик из БД одним запросом (после рестарта бота user_data пуст)."""
+    async with get_async_session() as session:
+        row = (await session.execute(draft_state_stmt(order_id, tg_user_id))).first()
+
+    if not row:
+        return None
+    return DraftOrder(
+        order_id=row.id,
+        session_id=row.session_id,
+        tg_user_id=row.tg_user_id,
+        drink_size_id=row.drink_size_id,
+        drink_count=row.drink_count,
+        add_ids=list(row.add_ids or []),
+        total_kopecks=to_kopecks(row.total_price),
+    )
+
+
+async def get_draft(
+    context: ContextTypes.DEFAULT_TYPE,
+    order_id: int,
+    tg_user_id: int
+) -> Optional[DraftOrder]:
+    """Черновик из памяти; в БД идём только если его там нет."""
+    draft = _drafts(context.user_data).get(order_id)
+    if draft is None:
+        draft = await _load_draft(order_id, tg_user_id)
+        if draft is not None:
+            remember_draft(context, draft)
+    return draft
+
+
+# Вся запись черновика — один оператор (data-modifying CTE):
+# обновить заказ, убрать снятые добавки, вставить новые, сохранить last_action.
+# Проверка status_id не даёт «оживить» уже просроченный или оплаченный заказ.
+_FLUSH_DRAFT_SQL = text("""
+WITH upd AS (
+    UPDATE public.orders
+       SET drink_count = :drink_count,
+           total_price = :total_price,
+           updated_at = :updated_at
+     WHERE id = :order_id AND status_id = :draft_status
+    RETURNING id, session_id
+), del AS (
+    DELETE FROM public.order_adds oa
+     USING upd
+     WHERE oa.order_id = upd.id
+       AND NOT (oa.add_id = ANY(:add_ids))
+), ins AS (
+    INSERT INTO public.order_adds (order_id, add_id)
+    SELECT upd.id, a.add_id
+      FROM upd, unnest(:add_ids) AS a(add_id)
+     WHERE NOT EXISTS (
+           SELECT 1 FROM public.order_adds oa
+            WHERE oa.order_id = upd.id AND oa.add_id = a.add_id
+     )
+), sess AS (
+    UPDATE public.sessions s
+       SET last_action = COALESCE(:last_action, s.last_action),
+           updated_at = :updated_at
+      FROM upd
+     WHERE s.id = upd.session_id
+)
+SELECT count(*) FROM upd
+""").bindparams(
+    bindparam("add_ids", type_=ARRAY(Integer)),
+    bindparam("last_action", type_=JSONB),
+)
+
+
+async def flush_draft(draft: DraftOrder) -> None:
+    """
+    Записать состояние черновика в orders/order_adds и last_action в sessions.
+
+    Стоимость: один SQL-оператор + COMMIT, независимо от того,
+    сколько раз пользователь нажимал ➕/➖ и добавки с прошлой записи.
+    """
+    async with draft.flush_lock:
+        if not draft.dirty:
+            return
+        # снимок состояния: пока идёт запись, пользователь может нажать ещё раз
+        revision = draft.revision
+        params = {
+            "order_id": draft.order_id,
+            "draft_status": ORDER_STATUS_DRAFT,
+            "drink_count": draft.drink_count,
+            "total_price": to_rubles(draft.total_kopecks),
+            "updated_at": datetime.utcnow(),
+            "add_ids": list(draft.add_ids),
+            "last_action": (
+                {"event": draft.last_event, "message_id": draft.message_id}
+                if draft.message_id else None
+            ),
+        }
+
+        async with get_async_session() as session:
+            updated = (await session.execute(_FLUSH_DRAFT_SQL, params)).scalar_one()
+            await session.commit()
+
+        if not updated:
+            logger.info("Draft %s is no longer a draft, flush skipped", draft.order_id)
+        draft.flushed_revision = revision
+
+
+def _flush_job_name(order_id: int) -> str:
+    return f"draft_flush_{order_id}"
+
+
+async def _flush_draft_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    draft = _drafts(context.user_data).get(context.job.data)
+    if draft is not None:
+        await flush_draft(draft)
+
+
+def schedule_draft_flush(context: ContextTypes.DEFAULT_TYPE, draft: DraftOrder) -> None:
+    """Отложенная запись: каждое новое нажатие переносит запись на DRAFT_FLUSH_DELAY секунд."""
+    cancel_draft_flush(context, draft.order_id)
+    context.job_queue.run_once(
+        _flush_draft_job,
+        when=DRAFT_FLUSH_DELAY,
+        data=draft.order_id,
+        name=_flush_job_name(draft.order_id),
+        user_id=draft.tg_user_id,
+        chat_id=draft.tg_user_id,
+    )
+
+
+def cancel_draft_flush(context: ContextTypes.DEFAULT_TYPE, order_id: int) -> None:
+    """Снять отложенную запись черновика (заказ оплачен, просрочен и т.п.)."""
+    for job in context.job_queue.get_jobs_by_name(_flush_job_name(order_id)):
+        job.schedule_removal()
+
+
+async def flush_pending_draft(context: ContextTypes.DEFAULT_TYPE, order_id: int) -> Optional[DraftOrder]:
+    """Немедленно записать черновик (перед оплатой) и снять отложенную запись."""
+    cancel_draft_flush(context, order_id)
+    draft = _drafts(context.user_data).get(order_id)
+    if draft is not None:
+        await flush_draft(draft)
+    return draft
@@ -0,0 +1,98 @@
+import os
+
+from telegram import InputMediaPhoto, Message
+
+from utils.keyboard_builder import build_drinks_list_keyboard
+from utils.telegram_retry import call_with_retry
+
+# Сколько карточек ещё отправляем по одной; больше — сворачиваем в альбом + клавиатуру
+CARDS_COLLAPSE_THRESHOLD = int(os.getenv("MENU_CARDS_COLLAPSE_THRESHOLD", "3"))
+MEDIA_GROUP_LIMIT = 10  # ограничение Telegram на количество фото в sendMediaGroup
+
+
+def _card_caption(drink, number: int | None = None) -> str:
+    prefix = f"{number}. " if number else ""
+    return f"{prefix}<b>{drink.name}</b>\n{drink.description or 'Без описания'}"
+
+
+async def _send_single_cards(message: Message, drinks) -> list[int]:
+    """Каждый напиток — отдельная карточка со своей клавиатурой размеров."""
+    message_ids = []
+    for drink in drinks:
+        if drink.image_file_id:
+            sent = await call_with_retry(
+                message.reply_photo,
+                photo=drink.image_file_id,
+                caption=_card_caption(drink),
+                reply_markup=drink.keyboard,
+                parse_mode="HTML"
+            )
+        else:
+            sent = await call_with_retry(
+                message.reply_text,
+                _card_caption(drink),
+                reply_markup=drink.keyboard,
+                parse_mode="HTML"
+            )
+        message_ids.append(sent.message_id)
+    return message_ids
+
+
+async def _send_collapsed_cards(message: Message, drinks) -> list[int]:
+    """
+    Свёрнутый показ: фото уходят альбомами по 10 (sendMediaGroup),
+    затем одно сообщение с пронумерованным списком и общей клавиатурой размеров.
+    Порядок сохраняется, а число запросов к Telegram не зависит от размера категории.
+    """
+    numbered = list(enumerate(drinks, start=1))
+    message_ids = []
+
+    photos = [
+        InputMediaPhoto(
+            media=drink.image_file_id,
+            caption=_card_caption(drink, number),
+            parse_mode="HTML"
+        )
+        for number, drink in numbered
+        if drink.image_file_id
+    ]
+    for i in range(0, len(photos), MEDIA_GROUP_LIMIT):
+        chunk = photos[i:i + MEDIA_GROUP_LIMIT]
+        if len(chunk) == 1:
+            # альбом из одного фото Telegram не принимает
+            sent = await call_with_retry(
+                message.reply_photo,
+                photo=chunk[0].media,
+                caption=chunk[0].caption,
+                parse_mode="HTML"
+            )
+            message_ids.append(sent.message_id)
+        else:
+            sent_group = await call_with_retry(message.reply_media_group, media=chunk)
+            message_ids.extend(m.message_id for m in sent_group)
+
+    text = "Выберите напиток и размер:\n" + "\n".join(
+        f"{number}. <b>{drink.name}</b>" for number, drink in numbered
+    )
+    keyboard = build_drinks_list_keyboard(
+        (number, [(s.id, s.size_name, s.price) for s in drink.sizes])
+        for number, drink in numbered
+    )
+    sent = await call_with_retry(
+        message.reply_text,
+        text,
+        reply_markup=keyboard,
+        parse_mode="HTML"
+    )
+    message_ids.append(sent.message_id)
+    return message_ids
+
+
+async def send_drink_cards(message: Message, drinks) -> list[int]:
+    """
+    Показать карточки напитков категории в ответ на message.
+    Возвращает id всех отправленных сообщений (для последующего удаления).
+    """
+    if len(drinks) <= CARDS_COLLAPSE_THRESHOLD:
+        return await _send_single_cards(message, drinks)
+    return await _send_collapsed_cards(message, drinks)
@@ -0,0 +1,79 @@
+import os
+import time
+from dataclasses import dataclass
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy import select
+
+from db.db_async import get_async_session
+from db.models.users import User
+
+# Сколько секунд доверяем закэшированным данным пользователя
+IDENTITY_CACHE_TTL = float(os.getenv("IDENTITY_CACHE_TTL", "600"))
+
+ROLE_CUSTOMER = 1
+ROLE_MANAGER = 2
+
+MANAGER_LIST = [
+    int(m.strip(" []")) for m in os.getenv("MANAGER_ID_LIST", "").split(",") if m.strip(" []")
+]
+
+
+@dataclass(frozen=True)
+class UserIdentity:
+    """То, что хендлерам нужно о пользователе: id, имя и роль (без ORM-объекта)."""
+    id: int
+    tg_user_id: int
+    username: str
+    firstname: Optional[str]
+
+    @property
+    def role_id(self) -> int:
+        return ROLE_MANAGER if self.tg_user_id in MANAGER_LIST else ROLE_CUSTOMER
+
+
+_identities: Dict[int, Tuple[float, UserIdentity]] = {}
+
+
+def remember_identity(user) -> UserIdentity:
+    """Положить пользователя в кэш (после регистрации или чтения из БД)."""
+    identity = UserIdentity(
+        id=user.id,
+        tg_user_id=user.tg_user_id,
+        username=user.username,
+        firstname=user.firstname,
+    )
+    _identities[identity.tg_user_id] = (time.monotonic() + IDENTITY_CACHE_TTL, identity)
+    return identity
+
+
+def forget_identity(tg_user_id: int) -> None:
+    _identities.pop(tg_user_id, None)
+
+
+def get_cached_identity(tg_user_id: int) -> Optional[UserIdentity]:
+    entry = _identities.get(tg_user_id)
+    if entry is None:
+        return None
+    expires_at, identity = entry
+    if expires_at < time.monotonic():
+        del _identities[tg_user_id]
+        return None
+    return identity
+
+
+async def get_identity(tg_user_id: int) -> Optional[UserIdentity]:
+    """
+    Пользователь по Telegram ID: из кэша или одним SELECT по users.
+    Отсутствующих пользователей не кэшируем — они сразу же регистрируются.
+    """
+    identity = get_cached_identity(tg_user_id)
+    if identity is not None:
+        return identity
+
+    async with get_async_session() as session:
+        row = (await session.execute(
+            select(User.id, User.tg_user_id, User.username, User.firstname)
+            .where(User.tg_user_id == tg_user_id)
+        )).first()
+    return remember_identity(row) if row else None
@@ -1,8 +1,10 @@
 from decimal import Decimal
 from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from telegram import InlineKeyboardButton, InlineKeyboardMarkup
 from db.models import DrinkSize, Size, Image
 from db.db_async import get_async_session
+from utils.pricing import format_rub
 
 def build_types_keyboard(types, selected):
     """Формирует inline-клавиатуру с отметками выбранных типов."""
@@ -43,61 +45,123 @@ def build_add_keyboard(adds, selected):
 
     return keyboard
 
-async def get_drink_sizes_keyboard(drink_id: int) -> tuple[list[dict], InlineKeyboardMarkup]:
+async def get_drink_sizes_keyboard(drink_id: int) -> tuple[list[dict], InlineKeyboardMarkup, str | None]:
     """
     Возвращает:
     1. Список размеров (для логики) — list[dict]
     2. InlineKeyboardMarkup с кнопками выбора размера
+    3. file_id первого активного фото (или None)
 
     Кнопка: "<Размер> – <Цена>₽"
     callback_data: "select_size_<drink_size_id>"
     """
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(
-                DrinkSize.id.label("drink_size_id"),
-                Size.name.label("size_name"),
-                DrinkSize.price
-            )
-            .join(Size, Size.id == DrinkSize.size_id)
-            .where(
-                DrinkSize.drink_id == drink_id,
-                DrinkSize.is_active == True
-            )
-            .order_by(DrinkSize.price.asc())
+    keyboards = await get_drink_sizes_keyboards([drink_id])
+    return keyboards[drink_id]
+
+async def get_drink_sizes_keyboards(
+    drink_ids: list[int],
+    session: AsyncSession | None = None
+) -> dict[int, tuple[list[dict], InlineKeyboardMarkup, str | None]]:
+    """
+    Пакетная версия get_drink_sizes_keyboard: размеры и первое фото для всех
+    напитков из drink_ids за два запроса, независимо от количества напитков.
+
+    Возвращает {drink_id: (sizes, InlineKeyboardMarkup, image_file_id)}.
+    Можно передать открытую session, чтобы не брать ещё одно соединение из пула.
+    """
+    drink_ids = list(dict.fromkeys(drink_ids))
+    if not drink_ids:
+        return {}
+
+    if session is None:
+        async with get_async_session() as own_session:
+            return await get_drink_sizes_keyboards(drink_ids, own_session)
+
+    result = await session.execute(
+        select(
+            DrinkSize.drink_id,
+            DrinkSize.id.label("drink_size_id"),
+            Size.name.label("size_name"),
+            Size.volume_ml,
+            DrinkSize.price
         )
-        sizes = result.mappings().all()
-
-                # Получаем первое активное фото
-        image_result = await session.execute(
-            select(Image.tg_file_id)
-            .where(Image.drink_id == drink_id, Image.is_active == True)
-            .order_by(Image.created_at.asc())
-            .limit(1)
+        .join(Size, Size.id == DrinkSize.size_id)
+        .where(
+            DrinkSize.drink_id.in_(drink_ids),
+            DrinkSize.is_active == True
         )
-        image_row = image_result.first()
-        image_file_id = image_row[0] if image_row else None
+        .order_by(DrinkSize.drink_id, DrinkSize.price.asc())
+    )
+    sizes_by_drink: dict[int, list[dict]] = {drink_id: [] for drink_id in drink_ids}
+    for row in result.mappings():
+        sizes_by_drink[row["drink_id"]].append(row)
+
+    # Первое активное фото каждого напитка (DISTINCT ON — одна строка на напиток)
+    image_result = await session.execute(
+        select(Image.drink_id, Image.tg_file_id)
+        .where(Image.drink_id.in_(drink_ids), Image.is_active == True)
+        .order_by(Image.drink_id, Image.created_at.asc())
+        .distinct(Image.drink_id)
+    )
+    images = {row.drink_id: row.tg_file_id for row in image_result}
+
+    return {
+        drink_id: (
+            sizes,
+            build_drink_sizes_keyboard(
+                (s['drink_size_id'], s['size_name'], s['price']) for s in sizes
+            ),
+            images.get(drink_id)
+        )
+        for drink_id, sizes in sizes_by_drink.items()
+    }
 
+def build_drink_sizes_keyboard(sizes) -> InlineKeyboardMarkup:
+    """
+    Клавиатура выбора размера из готовых данных (без обращения к БД).
+    sizes — итерируемое из кортежей (drink_size_id, size_name, price).
+    """
     # Формируем одну строку кнопок для размеров
     size_buttons = [
         InlineKeyboardButton(
-            f"{s['size_name']} – {float(s['price']):.0f}₽",
-            callback_data=f"select_size_{s['drink_size_id']}"
+            f"{size_name} – {float(price):.0f}₽",
+            callback_data=f"select_size_{drink_size_id}"
         )
-        for s in sizes
+        for drink_size_id, size_name, price in sizes
     ]
 
     keyboard = [size_buttons]  # все размеры в одном ряду
     keyboard.append([InlineKeyboardButton("🔙 Начать сначала", callback_data="new_order")])
 
-    return sizes, InlineKeyboardMarkup(keyboard), image_file_id
+    return InlineKeyboardMarkup(keyboard)
+
+def build_drinks_list_keyboard(drinks) -> InlineKeyboardMarkup:
+    """
+    Одна клавиатура на всю категорию (для свёрнутого показа карточек).
+    drinks — итерируемое из пар (номер напитка, размеры), где размеры —
+    кортежи (drink_size_id, size_name, price). Одна строка кнопок на напиток.
+    """
+    keyboard = [
+        [
+            InlineKeyboardButton(
+                f"{number}. {size_name} – {float(price):.0f}₽",
+                callback_data=f"select_size_{drink_size_id}"
+            )
+            for drink_size_id, size_name, price in sizes
+        ]
+        for number, sizes in drinks
+        if sizes
+    ]
+    keyboard.append([InlineKeyboardButton("🔙 Начать сначала", callback_data="new_order")])
+
+    return InlineKeyboardMarkup(keyboard)
 
-async def build_order_keyboard(order, adds, selected_adds, total_price):
-    """Формируем клавиатуру заказа"""
+async def build_order_keyboard(order_id, drink_count, adds, selected_adds, total_kopecks):
+    """Формируем клавиатуру заказа (сумма — в копейках, см. utils.pricing)"""
     qty_buttons = [
-        InlineKeyboardButton("➖", callback_data=f"update_qty_-_{order.id}"),
-        InlineKeyboardButton(str(order.drink_count), callback_data="noop"),
-        InlineKeyboardButton("➕", callback_data=f"update_qty_+_{order.id}")
+        InlineKeyboardButton("➖", callback_data=f"update_qty_-_{order_id}"),
+        InlineKeyboardButton(str(drink_count), callback_data="noop"),
+        InlineKeyboardButton("➕", callback_data=f"update_qty_+_{order_id}")
     ]
 
     add_buttons = []
@@ -105,13 +169,13 @@ async def build_order_keyboard(order, adds, selected_adds, total_price):
     for idx, add in enumerate(adds, start=1):
         is_selected = add.id in selected_adds
         label = f"{'🔘 ' if is_selected else '⚪️ '}{add.name} - {int(add.price)}₽"
-        row.append(InlineKeyboardButton(label, callback_data=f"toggle_add_{add.id}_{order.id}"))
+        row.append(InlineKeyboardButton(label, callback_data=f"toggle_add_{add.id}_{order_id}"))
         if idx % 2 == 0:
             add_buttons.append(row)
             row = []
     if row:
         add_buttons.append(row)
 
-    pay_button = [InlineKeyboardButton(f"💳 Оплатить {int(total_price)} ₽", callback_data=f"pay_{order.id}")]
+    pay_button = [InlineKeyboardButton(f"💳 Оплатить {format_rub(total_kopecks)} ₽", callback_data=f"pay_{order_id}")]
 
     return InlineKeyboardMarkup([qty_buttons] + add_buttons + [pay_button])
\ No newline at end of file
@@ -6,27 +6,90 @@ import os
 import sys
 from datetime import datetime
 from pathlib import Path
-from typing import Dict, Any
+from typing import Dict, Any, Iterable, Optional
 import traceback
 import asyncio
+import atexit
+import copy
+import queue
+import threading
+import socket
+import time
+import functools
+import random
+
+from utils.metrics import action_metrics, observe_action
+
+try:  # optional fast JSON encoder
+    import orjson
+except ImportError:
+    orjson = None
+
+
+def _json_dumps(data: Dict[str, Any]) -> str:
+    if orjson is not None:
+        return orjson.dumps(data, default=str).decode("utf-8")
+    return json.dumps(data, ensure_ascii=False, default=str)
+
+
+# Extra record attributes copied into JSON logs (see JSONFormatter)
+DEFAULT_EXTRA_FIELDS = (
+    'user_id',
+    'chat_id',
+    'message_id',
+    'action',
+    'execution_time',
+    'request_id',
+    'booking_ids',
+    'callback_data',
+    'dropped_records',
+)
+
 
 class JSONFormatter(logging.Formatter):
-    """Custom JSON formatter for structured logging"""
-    
+    """
+    Custom JSON formatter for structured logging.
+
+    Static fields (pid, hostname) are computed once, the timestamp comes from
+    ``record.created`` and only allow-listed extra attributes are emitted.
+    Uses orjson when installed, the stdlib json module otherwise.
+    """
+
+    def __init__(self, extra_fields: Optional[Iterable[str]] = None, **kwargs):
+        super().__init__(**kwargs)
+        if extra_fields is None:
+            extra_fields = DEFAULT_EXTRA_FIELDS + tuple(
+                f.strip() for f in os.getenv("LOG_JSON_EXTRA_FIELDS", "").split(",") if f.strip()
+            )
+        self.extra_fields = tuple(dict.fromkeys(extra_fields))
+        self.process_id = os.getpid()
+        self.hostname = socket.gethostname()
+        self._ts_second = None
+        self._ts_prefix = ""
+
+    def _timestamp(self, created: float) -> str:
+        # UTC ISO-8601 with microseconds; the per-second prefix is reused
+        second = int(created)
+        if second != self._ts_second:
+            self._ts_prefix = time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(second))
+            self._ts_second = second
+        return f"{self._ts_prefix}.{int((created - second) * 1_000_000):06d}"
+
     def format(self, record):
         # Create base log entry
         log_entry = {
-            'timestamp': datetime.utcnow().isoformat(),
+            'timestamp': self._timestamp(record.created),
             'level': record.levelname,
             'logger': record.name,
             'message': record.getMessage(),
             'module': record.module,
             'function': record.funcName,
             'line': record.lineno,
-            'process_id': os.getpid(),
+            'process_id': self.process_id,
+            'hostname': self.hostname,
             'thread_id': record.thread,
         }
-        
+
         # Add exception info if present
         if record.exc_info:
             log_entry['exception'] = {
@@ -34,26 +97,14 @@ class JSONFormatter(logging.Formatter):
                 'message': str(record.exc_info[1]) if record.exc_info[1] else None,
                 'traceback': traceback.format_exception(*record.exc_info)
             }
-        
-        # Add extra fields if present
-        if hasattr(record, 'user_id'):
-            log_entry['user_id'] = record.user_id
-        if hasattr(record, 'chat_id'):
-            log_entry['chat_id'] = record.chat_id
-        if hasattr(record, 'message_id'):
-            log_entry['message_id'] = record.message_id
-        if hasattr(record, 'action'):
-            log_entry['action'] = record.action
-        if hasattr(record, 'execution_time'):
-            log_entry['execution_time'] = record.execution_time
-        if hasattr(record, 'request_id'):
-            log_entry['request_id'] = record.request_id
-        if hasattr(record, 'booking_ids'):
-            log_entry['booking_ids'] = record.booking_ids
-        if hasattr(record, 'callback_data'):
-            log_entry['callback_data'] = record.callback_data
-            
-        return json.dumps(log_entry, ensure_ascii=False)
+
+        # Add allow-listed extra fields if present
+        attrs = record.__dict__
+        for key in self.extra_fields:
+            if key in attrs:
+                log_entry[key] = attrs[key]
+
+        return _json_dumps(log_entry)
 
 class TelegramLogFilter(logging.Filter):
     """Filter to add Telegram-specific context to log records"""
@@ -68,13 +119,89 @@ class TelegramLogFilter(logging.Filter):
             record.action = 'unknown'
         return True
 
+class DroppingQueueHandler(logging.handlers.QueueHandler):
+    """
+    QueueHandler over a bounded queue that never stalls the event loop.
+
+    When the queue is full, records below WARNING are dropped immediately;
+    WARNING and above wait up to ``block_timeout`` seconds for space
+    (backpressure) and are dropped only if the listener is still behind.
+    The number of dropped records is reported by the next record that fits.
+    """
+
+    def __init__(self, log_queue: queue.Queue, block_timeout: float = 0.05):
+        super().__init__(log_queue)
+        self.block_timeout = block_timeout
+        self.dropped = 0
+        self._dropped_lock = threading.Lock()
+
+    def prepare(self, record):
+        # Unlike the base implementation, keep exc_info so that the JSON
+        # formatter and the error log still get the full traceback.
+        record = copy.copy(record)
+        record.message = record.getMessage()
+        record.msg = record.message
+        record.args = None
+        return record
+
+    def _put(self, record, block: bool) -> bool:
+        try:
+            self.queue.put(record, block=block, timeout=self.block_timeout if block else None)
+            return True
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += 1
+            return False
+
+    def _report_dropped(self):
+        with self._dropped_lock:
+            dropped, self.dropped = self.dropped, 0
+        if not dropped:
+            return
+        notice = logging.LogRecord(
+            name=__name__, level=logging.WARNING, pathname=__file__, lineno=0,
+            msg=f"Log queue overflow: dropped {dropped} records",
+            args=None, exc_info=None, func="enqueue",
+        )
+        notice.action = 'log_queue_overflow'
+        notice.dropped_records = dropped
+        try:
+            self.queue.put_nowait(notice)
+        except queue.Full:
+            with self._dropped_lock:
+                self.dropped += dropped
+
+    def enqueue(self, record):
+        if self.dropped:
+            self._report_dropped()
+        self._put(record, block=record.levelno >= logging.WARNING)
+
+
+class _QueueListener(logging.handlers.QueueListener):
+    """QueueListener whose stop() waits for room in a full bounded queue."""
+
+    def enqueue_sentinel(self):
+        self.queue.put(self._sentinel)
+
+
+_queue_listener: logging.handlers.QueueListener | None = None
+
+
+def _stop_queue_listener():
+    global _queue_listener
+    if _queue_listener is not None:
+        _queue_listener.stop()  # flushes everything still in the queue
+        _queue_listener = None
+
+
 def setup_logging(
     log_level: str = "INFO",
     log_dir: str = "/app/logs",
     max_bytes: int = 10 * 1024 * 1024,  # 10MB
     backup_count: int = 5,
     enable_console: bool = True,
-    enable_file: bool = True
+    enable_file: bool = True,
+    queue_size: int = int(os.getenv("LOG_QUEUE_SIZE", "10000"))
 ):
     """
     Setup comprehensive logging configuration
@@ -86,6 +213,8 @@ def setup_logging(
         backup_count: Number of backup files to keep
         enable_console: Whether to enable console logging
         enable_file: Whether to enable file logging
+        queue_size: Capacity of the in-memory log queue; handlers run in a
+            background thread behind it. 0 attaches handlers directly.
     """
     
     # Create log directory
@@ -96,8 +225,10 @@ def setup_logging(
     root_logger.setLevel(getattr(logging, log_level.upper()))
     
     # Remove existing handlers
+    _stop_queue_listener()
     for handler in root_logger.handlers[:]:
         root_logger.removeHandler(handler)
+    handlers = []
     
     # Add Telegram filter
     telegram_filter = TelegramLogFilter()
@@ -111,7 +242,7 @@ def setup_logging(
         )
         console_handler.setFormatter(console_formatter)
         console_handler.addFilter(telegram_filter)
-        root_logger.addHandler(console_handler)
+        handlers.append(console_handler)
     
     if enable_file:
         # JSON file handler for structured logs
@@ -123,7 +254,7 @@ def setup_logging(
         )
         json_handler.setFormatter(JSONFormatter())
         json_handler.addFilter(telegram_filter)
-        root_logger.addHandler(json_handler)
+        handlers.append(json_handler)
         
         # Separate error log
         error_handler = logging.handlers.RotatingFileHandler(
@@ -138,7 +269,7 @@ def setup_logging(
             datefmt='%Y-%m-%d %H:%M:%S'
         )
         error_handler.setFormatter(error_formatter)
-        root_logger.addHandler(error_handler)
+        handlers.append(error_handler)
         
         # Performance log for tracking execution times
         perf_handler = logging.handlers.RotatingFileHandler(
@@ -149,8 +280,22 @@ def setup_logging(
         )
         perf_handler.addFilter(lambda record: hasattr(record, 'execution_time'))
         perf_handler.setFormatter(JSONFormatter())
-        root_logger.addHandler(perf_handler)
+        handlers.append(perf_handler)
     
+    if queue_size > 0:
+        # File I/O and formatting happen in the listener thread, not in the event loop
+        global _queue_listener
+        queue_handler = DroppingQueueHandler(queue.Queue(maxsize=queue_size))
+        _queue_listener = _QueueListener(
+            queue_handler.queue, *handlers, respect_handler_level=True
+        )
+        _queue_listener.start()
+        atexit.register(_stop_queue_listener)
+        root_logger.addHandler(queue_handler)
+    else:
+        for handler in handlers:
+            root_logger.addHandler(handler)
+
     # Configure specific loggers
     loggers_config = {
         'telegram': logging.WARNING,  # Reduce telegram library noise
@@ -165,6 +310,26 @@ def setup_logging(
     
     logging.info("Logging system initialized", extra={'action': 'logging_init'})
 
+def _parse_sample_rates(spec: str) -> Dict[str, float]:
+    """'action=0.1,other=0.5' -> {'action': 0.1, 'other': 0.5}"""
+    rates = {}
+    for item in spec.split(","):
+        action, sep, rate = item.partition("=")
+        if sep and action.strip():
+            rates[action.strip()] = min(max(float(rate), 0.0), 1.0)
+    return rates
+
+
+# Share of successful calls that log_function_call reports, per action.
+# Errors are always logged.
+DEFAULT_SAMPLE_RATE = float(os.getenv("LOG_SAMPLE_RATE", "1.0"))
+ACTION_SAMPLE_RATES = _parse_sample_rates(os.getenv("LOG_SAMPLE_RATES", ""))
+
+
+def _sample_rate(action: str) -> float:
+    return ACTION_SAMPLE_RATES.get(action, DEFAULT_SAMPLE_RATE)
+
+
 # Context manager for logging function execution time
 class LogExecutionTime:
     def __init__(self, action: str, logger: logging.Logger = None, user_id: int = None, chat_id: int = None):
@@ -172,23 +337,25 @@ class LogExecutionTime:
         self.logger = logger or logging.getLogger(__name__)
         self.user_id = user_id
         self.chat_id = chat_id
-        self.start_time = None
-    
+        self.start_ns = None
+
     def __enter__(self):
-        self.start_time = datetime.utcnow()
+        self.start_ns = time.perf_counter_ns()
         return self
-    
+
     def __exit__(self, exc_type, exc_val, exc_tb):
-        end_time = datetime.utcnow()
-        execution_time = (end_time - self.start_time).total_seconds()
-        
+        execution_time = (time.perf_counter_ns() - self.start_ns) / 1e9
+        observe_action(self.action, execution_time, ok=exc_type is None)
+        if not exc_type and not self.logger.isEnabledFor(logging.INFO):
+            return
+
         extra = {
             'action': self.action,
             'execution_time': execution_time,
             'user_id': self.user_id,
             'chat_id': self.chat_id
         }
-        
+
         if exc_type:
             self.logger.error(
                 f"Action '{self.action}' failed after {execution_time:.3f}s",
@@ -201,97 +368,127 @@ class LogExecutionTime:
                 extra=extra
             )
 
+
+def _telegram_ids(args, kwargs):
+    """(user_id, chat_id) from an Update passed as the first argument or from kwargs."""
+    if args and hasattr(args[0], 'effective_user'):
+        update = args[0]
+        return (
+            update.effective_user.id if update.effective_user else None,
+            update.effective_chat.id if update.effective_chat else None,
+        )
+    return kwargs.get('user_id'), kwargs.get('chat_id')
+
+
 # Decorator for automatic function logging
 def log_function_call(action: str = None, log_args: bool = False):
-    """Decorator to automatically log function calls with execution time"""
+    """
+    Decorator to log function calls with execution time.
+
+    Emits one INFO record per sampled successful call (with execution_time)
+    and one ERROR record per failure; "Starting ..." is logged at DEBUG only.
+    Every call (sampled or not) is counted in the metrics registry.
+    When INFO is disabled or the call is not sampled, the only overhead is a
+    level check, a random() draw and one perf_counter_ns() pair.
+    """
     def decorator(func):
-        def wrapper(*args, **kwargs):
-            func_action = action or f"{func.__module__}.{func.__name__}"
-            logger = logging.getLogger(func.__module__)
-            
-            # Extract Telegram context if available
-            user_id = kwargs.get('user_id')
-            chat_id = kwargs.get('chat_id')
-            
-            # Try to extract from Update object if present
-            if args and hasattr(args[0], 'effective_user'):
-                user_id = args[0].effective_user.id if args[0].effective_user else None
-                chat_id = args[0].effective_chat.id if args[0].effective_chat else None
-            
+        func_action = action or f"{func.__module__}.{func.__name__}"
+        logger = logging.getLogger(func.__module__)
+        metrics = action_metrics(func_action)
+
+        def _extra(args, kwargs, execution_time=None):
+            user_id, chat_id = _telegram_ids(args, kwargs)
             extra = {
                 'action': func_action,
                 'user_id': user_id,
                 'chat_id': chat_id
             }
-            
+            if execution_time is not None:
+                extra['execution_time'] = execution_time
             if log_args:
                 extra['function_args'] = str(args)
                 extra['function_kwargs'] = str(kwargs)
-            
-            with LogExecutionTime(func_action, logger, user_id, chat_id):
-                logger.info(f"Starting {func_action}", extra=extra)
-                try:
-                    result = func(*args, **kwargs)
-                    logger.debug(f"Completed {func_action}", extra=extra)
-                    return result
-                except Exception as e:
-                    logger.error(f"Error in {func_action}: {str(e)}", extra=extra, exc_info=True)
-                    raise
-        
+            return extra
+
+        def _should_report() -> bool:
+            if not logger.isEnabledFor(logging.INFO):
+                return False
+            rate = _sample_rate(func_action)
+            return rate >= 1.0 or random.random() < rate
+
+        def _on_start(args, kwargs):
+            if logger.isEnabledFor(logging.DEBUG):
+                logger.debug(f"Starting {func_action}", extra=_extra(args, kwargs))
+
+        def _on_success(args, kwargs, start_ns):
+            execution_time = (time.perf_counter_ns() - start_ns) / 1e9
+            metrics.record(execution_time)
+            if _should_report():
+                logger.info(
+                    f"Action '{func_action}' completed in {execution_time:.3f}s",
+                    extra=_extra(args, kwargs, execution_time)
+                )
+
+        def _on_error(args, kwargs, start_ns, e):
+            execution_time = (time.perf_counter_ns() - start_ns) / 1e9
+            metrics.record(execution_time, ok=False)
+            logger.error(
+                f"Error in {func_action} after {execution_time:.3f}s: {e}",
+                extra=_extra(args, kwargs, execution_time),
+                exc_info=True
+            )
+
         # Handle async functions
         if asyncio.iscoroutinefunction(func):
+            @functools.wraps(func)
             async def async_wrapper(*args, **kwargs):
-                func_action = action or f"{func.__module__}.{func.__name__}"
-                logger = logging.getLogger(func.__module__)
-                
-                # Extract Telegram context if available
-                user_id = kwargs.get('user_id')
-                chat_id = kwargs.get('chat_id')
-                
-                # Try to extract from Update object if present
-                if args and hasattr(args[0], 'effective_user'):
-                    user_id = args[0].effective_user.id if args[0].effective_user else None
-                    chat_id = args[0].effective_chat.id if args[0].effective_chat else None
-                
-                extra = {
-                    'action': func_action,
-                    'user_id': user_id,
-                    'chat_id': chat_id
-                }
-                
-                if log_args:
-                    extra['function_args'] = str(args)
-                    extra['function_kwargs'] = str(kwargs)
-                
-                with LogExecutionTime(func_action, logger, user_id, chat_id):
-                    logger.info(f"Starting {func_action}", extra=extra)
-                    try:
-                        result = await func(*args, **kwargs)
-                        logger.debug(f"Completed {func_action}", extra=extra)
-                        return result
-                    except Exception as e:
-                        logger.error(f"Error in {func_action}: {str(e)}", extra=extra, exc_info=True)
-                        raise
-            
+                _on_start(args, kwargs)
+                start_ns = time.perf_counter_ns()
+                try:
+                    result = await func(*args, **kwargs)
+                except Exception as e:
+                    _on_error(args, kwargs, start_ns, e)
+                    raise
+                _on_success(args, kwargs, start_ns)
+                return result
+
             return async_wrapper
-        
+
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            _on_start(args, kwargs)
+            start_ns = time.perf_counter_ns()
+            try:
+                result = func(*args, **kwargs)
+            except Exception as e:
+                _on_error(args, kwargs, start_ns, e)
+                raise
+            _on_success(args, kwargs, start_ns)
+            return result
+
         return wrapper
     return decorator
 
+
+class ContextAdapter(logging.LoggerAdapter):
+    """
+    Adds fixed Telegram context (user_id, chat_id, request_id) to every record.
+    Values passed explicitly in ``extra`` take precedence over the context.
+    """
+
+    def process(self, msg, kwargs):
+        if self.extra:
+            kwargs['extra'] = {**self.extra, **kwargs['extra']} if kwargs.get('extra') else self.extra
+        return msg, kwargs
+
+
 # Helper function to create logger with extra context
+@functools.lru_cache(maxsize=1024)
 def get_logger(name: str, user_id: int = None, chat_id: int = None, request_id: str = None):
-    """Get logger with pre-configured extra context"""
-    logger = logging.getLogger(name)
-    
-    class ContextAdapter(logging.LoggerAdapter):
-        def process(self, msg, kwargs):
-            extra = kwargs.get('extra', {})
-            extra.update({
-                'user_id': user_id,
-                'chat_id': chat_id,
-                'request_id': request_id
-            })
-            kwargs['extra'] = extra
-            return msg, kwargs
-    
-    return ContextAdapter(logger, {})
\ No newline at end of file
+    """Get logger with pre-configured extra context (adapters are created once per context)"""
+    context = {
+        key: value
+        for key, value in (('user_id', user_id), ('chat_id', chat_id), ('request_id', request_id))
+        if value is not None
+    }
+    return ContextAdapter(logging.getLogger(name), context)
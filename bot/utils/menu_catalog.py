@@ -0,0 +1,218 @@
+import asyncio
+import os
+import time
+from dataclasses import dataclass, field
+from datetime import datetime
+from decimal import Decimal
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import select
+from telegram import InlineKeyboardMarkup
+
+from db.db_async import get_async_session
+from db.models import Add, Drink, DrinkAdd, DrinkType
+from utils.keyboard_builder import get_drink_sizes_keyboards
+from utils.logging_config import get_logger
+from utils.pricing import PriceTable, load_price_table
+
+logger = get_logger(__name__)
+
+
+@dataclass(frozen=True)
+class CatalogSize:
+    id: int                 # drink_sizes.id
+    drink_id: int
+    size_name: str
+    volume_ml: int
+    price: Decimal
+
+
+@dataclass(frozen=True)
+class CatalogAdd:
+    id: int
+    name: str
+    price: Decimal
+
+
+@dataclass(frozen=True)
+class CatalogDrink:
+    id: int
+    type_id: int
+    name: str
+    description: Optional[str]
+    image_file_id: Optional[str]
+    sizes: Tuple[CatalogSize, ...]
+    adds: Tuple[CatalogAdd, ...]
+    keyboard: InlineKeyboardMarkup
+
+
+@dataclass(frozen=True)
+class CatalogType:
+    id: int
+    name: str
+
+
+@dataclass(frozen=True)
+class MenuCatalog:
+    """Неизменяемый снимок меню. Новая версия подменяет старую целиком."""
+    version: int
+    loaded_at: datetime
+    types: Tuple[CatalogType, ...]
+    prices: PriceTable
+    drinks: Dict[int, CatalogDrink] = field(default_factory=dict)
+    drinks_by_type: Dict[int, Tuple[CatalogDrink, ...]] = field(default_factory=dict)
+    drink_sizes: Dict[int, CatalogSize] = field(default_factory=dict)
+
+    def get_type(self, type_id: int) -> Optional[CatalogType]:
+        return next((t for t in self.types if t.id == type_id), None)
+
+    def get_drinks(self, type_id: int) -> Tuple[CatalogDrink, ...]:
+        return self.drinks_by_type.get(type_id, ())
+
+
+_catalog: Optional[MenuCatalog] = None
+_stale = True
+_generation = 0  # растёт при каждой инвалидации
+_retry_at = 0.0  # после неудачной перезагрузки до этого момента отдаём старый снимок
+
+# Пауза перед повторной перезагрузкой меню после ошибки БД, секунды
+MENU_RELOAD_BACKOFF = float(os.getenv("MENU_RELOAD_BACKOFF", "30"))
+_version = 0
+_lock = asyncio.Lock()
+
+
+async def _load_catalog(version: int) -> MenuCatalog:
+    """Читает меню из БД фиксированным числом запросов (не зависит от количества напитков)."""
+    async with get_async_session() as session:
+        type_rows = (await session.execute(
+            select(DrinkType.id, DrinkType.name).order_by(DrinkType.id)
+        )).all()
+
+        drink_rows = (await session.execute(
+            select(Drink.id, Drink.type_id, Drink.name, Drink.description)
+            .where(Drink.is_active == True, Drink.is_draft == False)
+            .order_by(Drink.id)
+        )).all()
+        drink_ids = [d.id for d in drink_rows]
+
+        keyboards, add_rows = {}, []
+        if drink_ids:
+            # размеры, клавиатуры и фото — одним пакетом на все напитки
+            keyboards = await get_drink_sizes_keyboards(drink_ids, session)
+
+            add_rows = (await session.execute(
+                select(DrinkAdd.drink_id, Add.id, Add.name, Add.price)
+                .join(Add, Add.id == DrinkAdd.add_id)
+                .where(DrinkAdd.drink_id.in_(drink_ids))
+                .order_by(DrinkAdd.id)
+            )).all()
+
+        prices = await load_price_table(session)
+
+    adds_by_drink: Dict[int, List[CatalogAdd]] = {}
+    for row in add_rows:
+        adds_by_drink.setdefault(row.drink_id, []).append(CatalogAdd(row.id, row.name, row.price))
+
+    drinks: Dict[int, CatalogDrink] = {}
+    drink_sizes: Dict[int, CatalogSize] = {}
+    drinks_by_type: Dict[int, List[CatalogDrink]] = {}
+    for row in drink_rows:
+        size_rows, keyboard, image_file_id = keyboards[row.id]
+        sizes = tuple(
+            CatalogSize(s["drink_size_id"], row.id, s["size_name"], s["volume_ml"], s["price"])
+            for s in size_rows
+        )
+        drink_sizes.update((s.id, s) for s in sizes)
+        drink = CatalogDrink(
+            id=row.id,
+            type_id=row.type_id,
+            name=row.name,
+            description=row.description,
+            image_file_id=image_file_id,
+            sizes=sizes,
+            adds=tuple(adds_by_drink.get(row.id, ())),
+            keyboard=keyboard,
+        )
+        drinks[drink.id] = drink
+        drinks_by_type.setdefault(drink.type_id, []).append(drink)
+
+    return MenuCatalog(
+        version=version,
+        loaded_at=datetime.utcnow(),
+        types=tuple(CatalogType(t.id, t.name) for t in type_rows),
+        prices=prices,
+        drinks=drinks,
+        drinks_by_type={k: tuple(v) for k, v in drinks_by_type.items()},
+        drink_sizes=drink_sizes,
+    )
+
+
+async def _reload_locked(reason: str) -> MenuCatalog:
+    global _catalog, _stale, _version, _retry_at
+    _version += 1
+    # инвалидация, пришедшая во время загрузки, должна пережить эту перезагрузку
+    generation = _generation
+    try:
+        catalog = await _load_catalog(_version)
+    except Exception:
+        _stale = True
+        if _catalog is None:
+            raise
+        _retry_at = time.monotonic() + MENU_RELOAD_BACKOFF
+        logger.exception(
+            "Menu catalog reload failed (%s), serving v%s, retry in %ss",
+            reason, _catalog.version, MENU_RELOAD_BACKOFF,
+            extra={"action": "menu_catalog_reload"}
+        )
+        return _catalog
+    _catalog = catalog
+    _retry_at = 0.0
+    if generation == _generation:
+        _stale = False
+    logger.info(
+        "Menu catalog v%s loaded (%s): %s types, %s drinks",
+        catalog.version, reason, len(catalog.types), len(catalog.drinks),
+        extra={"action": "menu_catalog_reload"}
+    )
+    return catalog
+
+
+async def reload_menu_catalog(reason: str = "manual") -> MenuCatalog:
+    """Перечитать меню из БД и атомарно подменить снимок."""
+    async with _lock:
+        return await _reload_locked(reason)
+
+
+async def init_menu_catalog() -> MenuCatalog:
+    """Первичная загрузка меню (вызывается из post_init)."""
+    return await reload_menu_catalog(reason="startup")
+
+
+def invalidate_menu_catalog() -> None:
+    """Пометить снимок устаревшим — следующий get_menu_catalog перечитает меню."""
+    global _stale, _generation
+    _generation += 1
+    _stale = True
+
+
+def _serve_current() -> bool:
+    """Можно ли отдать текущий снимок без перезагрузки."""
+    if _catalog is None:
+        return False
+    # свежий снимок, пауза после ошибки или меню уже перечитывает другой обработчик
+    return not _stale or time.monotonic() < _retry_at or _lock.locked()
+
+
+async def get_menu_catalog() -> MenuCatalog:
+    """
+    Текущий снимок меню; в БД идём только после инвалидации.
+    Пока идёт перезагрузка или после её ошибки (MENU_RELOAD_BACKOFF)
+    отдаём предыдущий снимок, не дожидаясь БД.
+    """
+    if _serve_current():
+        return _catalog
+    async with _lock:
+        # пока ждали блокировку, снимок мог перечитать другой обработчик
+        if _catalog is not None and (not _stale or time.monotonic() < _retry_at):
+            return _catalog
+        return await _reload_locked(reason="stale")
@@ -0,0 +1,54 @@
+import asyncio
+from typing import Iterable
+
+from telegram.error import TelegramError
+from telegram.ext import ContextTypes
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+DELETE_MESSAGES_LIMIT = 100  # максимум id в одном вызове deleteMessages
+
+
+async def _delete_one(bot, chat_id: int, message_id: int) -> None:
+    try:
+        await bot.delete_message(chat_id=chat_id, message_id=message_id)
+    except TelegramError as e:
+        # сообщение уже удалено или старше 48 часов — это не ошибка сценария
+        logger.debug("Не удалось удалить сообщение %s: %s", message_id, e)
+
+
+async def delete_messages(bot, chat_id: int, message_ids: Iterable[int]) -> None:
+    """
+    Удалить пачку сообщений в чате.
+    Если версия PTB поддерживает Bot API deleteMessages — удаляем пачками по 100,
+    иначе (и при ошибке пакетного вызова) — параллельными deleteMessage.
+    """
+    ids = [m for m in dict.fromkeys(message_ids) if m]
+    if not ids:
+        return
+
+    bulk_delete = getattr(bot, "delete_messages", None)
+    if bulk_delete is not None:
+        for i in range(0, len(ids), DELETE_MESSAGES_LIMIT):
+            chunk = ids[i:i + DELETE_MESSAGES_LIMIT]
+            try:
+                await bulk_delete(chat_id=chat_id, message_ids=chunk)
+            except TelegramError as e:
+                logger.debug("deleteMessages failed, deleting one by one: %s", e)
+                await asyncio.gather(*(_delete_one(bot, chat_id, m) for m in chunk))
+        return
+
+    await asyncio.gather(*(_delete_one(bot, chat_id, m) for m in ids))
+
+
+def schedule_delete_messages(
+    context: ContextTypes.DEFAULT_TYPE,
+    chat_id: int,
+    message_ids: Iterable[int]
+) -> None:
+    """Удалить сообщения в фоне, не задерживая ответ пользователю."""
+    ids = [m for m in message_ids if m]
+    if ids:
+        context.application.create_task(delete_messages(context.bot, chat_id, ids))
@@ -0,0 +1,247 @@
+"""
+In-process metrics registry: counters and latency histograms.
+
+The bot feeds it from log_function_call / LogExecutionTime, SQLAlchemy engine
+events and Bot API requests. The bot and the FastAPI app (api/main.py) are
+separate processes, so the bot periodically writes a JSON snapshot next to
+its logs and the API renders that snapshot at /metrics in the Prometheus
+text format.
+"""
+import json
+import os
+import threading
+import time
+from bisect import bisect_left
+from typing import Dict, Iterable, Tuple
+
+# Seconds; chosen around handler/DB/Bot API latencies of the bot
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+METRICS_SNAPSHOT_PATH = os.getenv(
+    "METRICS_SNAPSHOT_PATH",
+    os.path.join(os.getenv("LOG_DIR", "/app/logs"), "bot_metrics.json")
+)
+METRICS_DUMP_INTERVAL = float(os.getenv("METRICS_DUMP_INTERVAL", "15"))
+
+LabelKey = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Fixed-bucket histogram; counts are per bucket (not cumulative) until rendering."""
+
+    __slots__ = ("bounds", "counts", "sum", "count")
+
+    def __init__(self, bounds: Tuple[float, ...] = LATENCY_BUCKETS):
+        self.bounds = bounds
+        self.counts = [0] * (len(bounds) + 1)  # last slot is +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect_left(self.bounds, value)] += 1
+        self.sum += value
+        self.count += 1
+
+
+class CounterCell:
+    """A counter series' value; bound once so hot paths can bump it directly."""
+
+    __slots__ = ("value",)
+
+    def __init__(self):
+        self.value = 0
+
+
+def _label_dict(key: LabelKey) -> Dict[str, str]:
+    return {k: str(v) for k, v in key}
+
+
+class MetricsRegistry:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters: Dict[str, Dict[LabelKey, CounterCell]] = {}
+        self._histograms: Dict[str, Dict[LabelKey, Histogram]] = {}
+        self._help: Dict[str, str] = {}
+
+    def describe(self, name: str, help_text: str) -> None:
+        self._help[name] = help_text
+
+    # Series are keyed by the label items as passed (call sites pass them in a
+    # fixed order); values are stringified only in snapshot(), off the hot path.
+    def _counter_locked(self, name: str, key: LabelKey) -> CounterCell:
+        series = self._counters.setdefault(name, {})
+        cell = series.get(key)
+        if cell is None:
+            cell = series[key] = CounterCell()
+        return cell
+
+    def _histogram_locked(self, name: str, key: LabelKey) -> Histogram:
+        series = self._histograms.setdefault(name, {})
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        return histogram
+
+    def counter(self, name: str, **labels) -> CounterCell:
+        """The cell of one counter series, created on first use."""
+        with self._lock:
+            return self._counter_locked(name, tuple(labels.items()))
+
+    def histogram(self, name: str, **labels) -> Histogram:
+        """One histogram series, created on first use."""
+        with self._lock:
+            return self._histogram_locked(name, tuple(labels.items()))
+
+    def inc(self, name: str, value: float = 1, **labels) -> None:
+        key = tuple(labels.items())
+        with self._lock:
+            self._counter_locked(name, key).value += value
+
+    def observe(self, name: str, value: float, **labels) -> None:
+        key = tuple(labels.items())
+        with self._lock:
+            self._histogram_locked(name, key).observe(value)
+
+    def snapshot(self) -> dict:
+        """JSON-serialisable copy of all series."""
+        with self._lock:
+            return {
+                "generated_at": time.time(),
+                "pid": os.getpid(),
+                "help": dict(self._help),
+                "counters": {
+                    name: [{"labels": _label_dict(key), "value": cell.value} for key, cell in series.items()]
+                    for name, series in self._counters.items()
+                },
+                "histograms": {
+                    name: [
+                        {
+                            "labels": _label_dict(key),
+                            "bounds": list(h.bounds),
+                            "counts": list(h.counts),
+                            "sum": h.sum,
+                            "count": h.count,
+                        }
+                        for key, h in series.items()
+                    ]
+                    for name, series in self._histograms.items()
+                },
+            }
+
+
+registry = MetricsRegistry()
+registry.describe("bot_action_duration_seconds", "Duration of bot handlers and timed actions")
+registry.describe("bot_action_calls_total", "Bot handler and timed action calls by outcome")
+registry.describe("bot_db_query_duration_seconds", "Duration of SQL statements by operation")
+registry.describe("bot_db_query_errors_total", "Failed SQL statements by operation")
+registry.describe("bot_telegram_request_duration_seconds", "Duration of Bot API requests by method")
+registry.describe("bot_telegram_request_errors_total", "Failed Bot API requests by method")
+
+
+class ActionMetrics:
+    """
+    Duration histogram and outcome counters of one action, looked up once
+    (when a handler is decorated) so each call is a single lock section.
+    """
+
+    __slots__ = ("_lock", "_histogram", "_ok", "_error")
+
+    def __init__(self, action: str, metrics: MetricsRegistry = None):
+        metrics = metrics or registry
+        self._lock = metrics._lock
+        self._histogram = metrics.histogram("bot_action_duration_seconds", action=action)
+        self._ok = metrics.counter("bot_action_calls_total", action=action, status="ok")
+        self._error = metrics.counter("bot_action_calls_total", action=action, status="error")
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self._histogram.observe(seconds)
+            if ok:
+                self._ok.value += 1
+            else:
+                self._error.value += 1
+
+
+_action_metrics: Dict[str, ActionMetrics] = {}
+
+
+def action_metrics(action: str) -> ActionMetrics:
+    metrics = _action_metrics.get(action)
+    if metrics is None:
+        metrics = _action_metrics[action] = ActionMetrics(action)
+    return metrics
+
+
+def observe_action(action: str, seconds: float, ok: bool = True) -> None:
+    """Handler / LogExecutionTime timing: histogram plus an outcome counter."""
+    action_metrics(action).record(seconds, ok)
+
+
+def write_snapshot(path: str = METRICS_SNAPSHOT_PATH) -> None:
+    """Atomically replace the snapshot file read by the API process."""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(registry.snapshot(), f)
+    os.replace(tmp_path, path)
+
+
+async def dump_metrics_job(context) -> None:
+    """JobQueue callback: periodic snapshot for /metrics."""
+    write_snapshot()
+
+
+def read_snapshot(path: str = METRICS_SNAPSHOT_PATH) -> dict | None:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _escape(value: str) -> str:
+    return value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(labels: Dict[str, str], extra: Iterable[Tuple[str, str]] = ()) -> str:
+    items = list(labels.items()) + list(extra)
+    if not items:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape(str(v))}"' for k, v in items) + "}"
+
+
+def _format_bound(bound: float) -> str:
+    return repr(float(bound))
+
+
+def render_prometheus(snapshot: dict | None) -> str:
+    """Prometheus text exposition format (version 0.0.4) for a snapshot."""
+    if not snapshot:
+        return "# no metrics snapshot yet\n"
+
+    help_texts = snapshot.get("help", {})
+    lines = [
+        "# HELP bot_metrics_snapshot_timestamp_seconds Time the bot wrote this snapshot",
+        "# TYPE bot_metrics_snapshot_timestamp_seconds gauge",
+        f"bot_metrics_snapshot_timestamp_seconds {snapshot['generated_at']}",
+    ]
+
+    for name, series in sorted(snapshot.get("counters", {}).items()):
+        lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+        lines.append(f"# TYPE {name} counter")
+        for item in series:
+            lines.append(f"{name}{_labels(item['labels'])} {item['value']}")
+
+    for name, series in sorted(snapshot.get("histograms", {}).items()):
+        lines.append(f"# HELP {name} {help_texts.get(name, name)}")
+        lines.append(f"# TYPE {name} histogram")
+        for item in series:
+            cumulative = 0
+            for bound, count in zip(item["bounds"], item["counts"]):
+                cumulative += count
+                le = (("le", _format_bound(bound)),)
+                lines.append(f"{name}_bucket{_labels(item['labels'], le)} {cumulative}")
+            lines.append(f"{name}_bucket{_labels(item['labels'], (('le', '+Inf'),))} {item['count']}")
+            lines.append(f"{name}_sum{_labels(item['labels'])} {item['sum']}")
+            lines.append(f"{name}_count{_labels(item['labels'])} {item['count']}")
+
+    return "\n".join(lines) + "\n"
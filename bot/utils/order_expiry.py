@@ -0,0 +1,202 @@
+import asyncio
+import os
+from datetime import datetime, timedelta
+
+from sqlalchemy import select, update
+from telegram import InlineKeyboardMarkup, InlineKeyboardButton
+from telegram.ext import Application, ContextTypes, JobQueue
+
+from db.db_async import get_async_session
+from db.models import Order, Session
+from utils.logging_config import LogExecutionTime, get_logger
+from utils.draft_orders import forget_draft, cancel_draft_flush
+from utils.telegram_retry import call_with_retry
+
+logger = get_logger(__name__)
+
+ORDER_STATUS_DRAFT = 8      # "черновик"
+ORDER_STATUS_EXPIRED = 7    # "время истекло"
+ORDER_EXPIRE_AFTER = timedelta(minutes=10)
+
+# Страховочный обход просроченных черновиков (на случай потерянного таймера), секунды
+EXPIRY_SWEEP_INTERVAL = int(os.getenv("EXPIRY_SWEEP_INTERVAL", "3600"))
+
+# Сколько уведомлений о просрочке отправляем одновременно
+NOTIFY_CONCURRENCY = int(os.getenv("EXPIRY_NOTIFY_CONCURRENCY", "10"))
+
+
+def _expiry_job_name(order_id: int) -> str:
+    return f"order_expiry_{order_id}"
+
+
+def cancel_order_expiry(job_queue: JobQueue, order_id: int) -> None:
+    """Снять таймер просрочки (заказ оплачен или уже просрочен)."""
+    for job in job_queue.get_jobs_by_name(_expiry_job_name(order_id)):
+        job.schedule_removal()
+
+
+def schedule_order_expiry(
+    job_queue: JobQueue,
+    order_id: int,
+    tg_user_id: int,
+    last_change: datetime | None = None
+) -> None:
+    """
+    Таймер просрочки черновика: ровно ORDER_EXPIRE_AFTER после последнего изменения.
+    Каждое изменение черновика переносит таймер; last_change — UTC, как orders.updated_at.
+    """
+    cancel_order_expiry(job_queue, order_id)
+    delay = ORDER_EXPIRE_AFTER
+    if last_change is not None:
+        delay = max(last_change + ORDER_EXPIRE_AFTER - datetime.utcnow(), timedelta(0))
+    job_queue.run_once(
+        _expire_order_job,
+        when=delay,
+        data=order_id,
+        name=_expiry_job_name(order_id),
+        user_id=tg_user_id,
+        chat_id=tg_user_id,
+    )
+
+
+def forget_expired_draft(application: Application, order_id: int, tg_user_id: int) -> None:
+    """Убрать черновик из памяти владельца вместе с его отложенной записью и таймером."""
+    cancel_draft_flush(application, order_id)
+    cancel_order_expiry(application.job_queue, order_id)
+    user_data = application.user_data.get(tg_user_id)
+    if user_data is not None:
+        forget_draft(user_data, order_id)
+
+
+async def _expire_order_job(context: ContextTypes.DEFAULT_TYPE) -> None:
+    """Просрочить один черновик. Оплаченный или уже отменённый заказ не трогаем."""
+    order_id = context.job.data
+    try:
+        async with get_async_session() as session:
+            row = (await session.execute(
+                update(Order)
+                .where(
+                    Order.id == order_id,
+                    Order.status_id == ORDER_STATUS_DRAFT,
+                    Order.is_active == True
+                )
+                .values(status_id=ORDER_STATUS_EXPIRED, updated_at=datetime.utcnow())
+                .returning(Order.id, Order.tg_user_id, Order.session_id, Order.created_at)
+                .execution_options(synchronize_session=False)
+            )).first()
+            await session.commit()
+
+        if row is None:
+            logger.debug("Order %s is no longer a draft, expiry skipped", order_id)
+            return
+
+        forget_expired_draft(context.application, row.id, row.tg_user_id)
+        await notify_timeouts(context.bot, [row])
+
+    except Exception as e:
+        logger.exception(
+            f"Ошибка при просрочке заказа {order_id}: {e}",
+            extra={"action": "expire_order", "order_id": order_id}
+        )
+
+
+async def restore_order_expiry_jobs(application: Application) -> int:
+    """
+    После рестарта таймеры в JobQueue пусты: ставим их заново для живых черновиков.
+    Уже просроченные черновики забирает разовый check_expired_order.
+    """
+    since = datetime.utcnow() - ORDER_EXPIRE_AFTER
+    async with get_async_session() as session:
+        rows = (await session.execute(
+            select(Order.id, Order.tg_user_id, Order.updated_at)
+            .where(
+                Order.status_id == ORDER_STATUS_DRAFT,
+                Order.is_active == True,
+                Order.updated_at >= since
+            )
+        )).all()
+
+    for row in rows:
+        schedule_order_expiry(application.job_queue, row.id, row.tg_user_id, row.updated_at)
+    logger.info(f"Restored {len(rows)} order expiry timers", extra={"action": "restore_order_expiry"})
+    return len(rows)
+
+
+def _timeout_keyboard() -> InlineKeyboardMarkup:
+    return InlineKeyboardMarkup([
+        [InlineKeyboardButton("🆕 Новый заказ", callback_data="new_order")]
+    ])
+
+
+async def _load_last_actions(session_ids) -> dict:
+    """last_action всех нужных сессий одним запросом: {session_id: last_action}."""
+    ids = {sid for sid in session_ids if sid}
+    if not ids:
+        return {}
+    async with get_async_session() as session:
+        rows = await session.execute(
+            select(Session.id, Session.last_action).where(Session.id.in_(ids))
+        )
+        return {row.id: row.last_action for row in rows}
+
+
+async def notify_timeout(bot, order, last_action: dict | None = None):
+    """
+    Уведомление пользователя о том, что заказ истёк + удаление последнего сообщения.
+    order — строка RETURNING (id, tg_user_id, session_id, created_at).
+    """
+    guest_chat_id = order.tg_user_id
+    created_local = (order.created_at + timedelta(hours=3)).replace(second=0, microsecond=0)
+    created_str = created_local.strftime("%Y-%m-%d %H:%M")
+
+    # Удаляем последнее сообщение из сессии, если есть
+    last_msg_id = (last_action or {}).get("message_id")
+    if last_msg_id:
+        try:
+            await call_with_retry(bot.delete_message, chat_id=guest_chat_id, message_id=last_msg_id)
+            logger.info(f"Deleted last message {last_msg_id} for user {guest_chat_id}")
+        except Exception as e:
+            logger.warning(f"Failed to delete message {last_msg_id}: {e}")
+
+    # Отправляем уведомление о просроченном заказе
+    await call_with_retry(
+        bot.send_message,
+        chat_id=guest_chat_id,
+        text=f"⏰ Ваш заказ от {created_str} просрочен и был отменён.\nНачните новый заказ.",
+        reply_markup=_timeout_keyboard()
+    )
+
+    logger.info(
+        f"Timeout notifications sent for order {order.id}",
+        extra={
+            "action": "notify_timeout",
+            "order_id": order.id,
+            "guest_chat_id": guest_chat_id
+        }
+    )
+
+
+async def notify_timeouts(bot, orders) -> None:
+    """
+    Уведомить владельцев просроченных заказов.
+    last_action читается одним запросом на всю пачку, пары delete+send идут
+    параллельно, но не больше NOTIFY_CONCURRENCY одновременно (flood control
+    Telegram дополнительно обрабатывает call_with_retry).
+    """
+    if not orders:
+        return
+    last_actions = await _load_last_actions(o.session_id for o in orders)
+    semaphore = asyncio.Semaphore(NOTIFY_CONCURRENCY)
+
+    async def _notify(order):
+        async with semaphore:
+            try:
+                with LogExecutionTime("notify_timeout", logger, user_id=order.tg_user_id):
+                    await notify_timeout(bot, order, last_actions.get(order.session_id))
+            except Exception as e:
+                logger.warning(
+                    f"Failed to notify about expired order {order.id}: {e}",
+                    extra={"action": "notify_timeout", "order_id": order.id}
+                )
+
+    await asyncio.gather(*(_notify(o) for o in orders))
@@ -0,0 +1,77 @@
+from array import array
+from decimal import Decimal
+from typing import Iterable, Mapping
+
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from db.models import Add, DrinkSize
+
+MISSING = -1
+
+
+def to_kopecks(price) -> int:
+    """Цена из БД (Numeric, рубли) -> целые копейки."""
+    return int((Decimal(price) * 100).to_integral_value())
+
+
+def to_rubles(kopecks: int) -> Decimal:
+    """Копейки -> рубли для записи в orders.total_price (Numeric(5,1))."""
+    return Decimal(kopecks) / 100
+
+
+def format_rub(kopecks: int) -> str:
+    """Цена для текста сообщений: без копеек, если они нулевые."""
+    rubles, rest = divmod(kopecks, 100)
+    return str(rubles) if not rest else f"{rubles}.{rest:02d}".rstrip("0")
+
+
+def _dense(prices: Mapping[int, int]) -> array:
+    """Массив цен, где индекс — id строки (id в справочниках маленькие и плотные)."""
+    table = array("q", [MISSING]) * (max(prices, default=0) + 1)
+    for row_id, kopecks in prices.items():
+        table[row_id] = kopecks
+    return table
+
+
+class PriceTable:
+    """
+    Прайс в копейках: drink_sizes.price и adds.price в компактных массивах по id.
+    Расчёт суммы заказа — чистый Python, без ORM и загрузки связей.
+    """
+
+    __slots__ = ("_drink_sizes", "_adds")
+
+    def __init__(self, drink_size_prices: Mapping[int, int], add_prices: Mapping[int, int]):
+        self._drink_sizes = _dense(drink_size_prices)
+        self._adds = _dense(add_prices)
+
+    @staticmethod
+    def _lookup(table: array, row_id: int, what: str) -> int:
+        price = table[row_id] if 0 <= row_id < len(table) else MISSING
+        if price == MISSING:
+            raise KeyError(f"No price for {what} id={row_id}")
+        return price
+
+    def drink_size_price(self, drink_size_id: int) -> int:
+        return self._lookup(self._drink_sizes, drink_size_id, "drink_size")
+
+    def add_price(self, add_id: int) -> int:
+        return self._lookup(self._adds, add_id, "add")
+
+    def order_total(self, drink_size_id: int, drink_count: int, add_ids: Iterable[int] = ()) -> int:
+        """Сумма заказа в копейках: напиток × количество + добавки (по одной на заказ)."""
+        return (
+            self.drink_size_price(drink_size_id) * drink_count
+            + sum(self.add_price(a) for a in add_ids)
+        )
+
+
+async def load_price_table(session: AsyncSession) -> PriceTable:
+    """Прайс по всем размерам и добавкам (включая снятые с продажи — для старых черновиков)."""
+    drink_sizes = await session.execute(select(DrinkSize.id, DrinkSize.price))
+    adds = await session.execute(select(Add.id, Add.price))
+    return PriceTable(
+        {row.id: to_kopecks(row.price) for row in drink_sizes},
+        {row.id: to_kopecks(row.price) for row in adds},
+    )
@@ -0,0 +1,52 @@
+import time
+from urllib.parse import urlsplit
+
+from telegram.error import TelegramError
+from telegram.request import HTTPXRequest
+
+from utils.metrics import registry as metrics
+
+FILE_DOWNLOAD_METHOD = "file_download"
+OTHER_METHOD = "other"
+
+
+def api_method_label(url: str) -> str:
+    """
+    Метка method для URL запроса: имя метода для /bot<token>/<method>,
+    одна общая метка для скачивания файлов (/file/bot<token>/<path>),
+    чтобы имена файлов не плодили серии метрик.
+    """
+    parts = urlsplit(url).path.strip("/").split("/")
+    if parts and parts[0] == "file":
+        return FILE_DOWNLOAD_METHOD
+    if len(parts) == 2 and parts[0].startswith("bot"):
+        return parts[1]
+    return OTHER_METHOD
+
+
+class TimedHTTPXRequest(HTTPXRequest):
+    """
+    HTTPXRequest, который пишет длительность каждого вызова Bot API
+    в гистограмму bot_telegram_request_duration_seconds (метка method — sendMessage и т.п.).
+    """
+
+    async def do_request(self, url: str, *args, **kwargs):
+        api_method = api_method_label(url)
+        started = time.perf_counter_ns()
+        try:
+            code, payload = await super().do_request(url, *args, **kwargs)
+        except TelegramError:
+            # сетевые ошибки и таймауты
+            metrics.inc("bot_telegram_request_errors_total", method=api_method, code="network")
+            raise
+        else:
+            if code >= 400:
+                # 429, 400 и т.п.: исключение поднимет уже BaseRequest
+                metrics.inc("bot_telegram_request_errors_total", method=api_method, code=str(code))
+            return code, payload
+        finally:
+            metrics.observe(
+                "bot_telegram_request_duration_seconds",
+                (time.perf_counter_ns() - started) / 1e9,
+                method=api_method,
+            )
@@ -0,0 +1,32 @@
+import asyncio
+
+from telegram.error import RetryAfter
+
+from utils.logging_config import get_logger
+
+logger = get_logger(__name__)
+
+MAX_RETRY_AFTER = 30  # секунд; дольше ждать внутри хендлера нет смысла
+
+
+async def call_with_retry(method, *args, attempts: int = 3, **kwargs):
+    """
+    Вызов метода Bot API с учётом flood control (HTTP 429).
+    При RetryAfter ждём столько, сколько попросил Telegram, и повторяем запрос.
+    Остальные ошибки пробрасываются вызывающему коду.
+    """
+    for attempt in range(1, attempts + 1):
+        try:
+            return await method(*args, **kwargs)
+        except RetryAfter as e:
+            # в PTB 20.x retry_after — int секунд, в новых версиях — timedelta
+            retry_after = e.retry_after
+            delay = retry_after.total_seconds() if hasattr(retry_after, "total_seconds") else float(retry_after)
+            if attempt == attempts or delay > MAX_RETRY_AFTER:
+                raise
+            logger.warning(
+                "Flood control on %s, retry in %.1fs (attempt %s/%s)",
+                getattr(method, "__name__", method), delay, attempt, attempts,
+                extra={"action": "telegram_retry_after"}
+            )
+            await asyncio.sleep(delay)
@@ -1,9 +1,12 @@
-from sqlalchemy import select, update, desc
+import os
+from dataclasses import dataclass
+from sqlalchemy import select, update, desc, text
 from sqlalchemy.orm import joinedload
 
-from datetime import datetime
+from datetime import datetime, timedelta
 
 from db.db_async import get_async_session
+from utils.identity_cache import get_identity, remember_identity
 
 from db.models.users import User
 from db.models.sessions import Session
@@ -12,16 +15,13 @@ from db.models.orders import Order
 from db.models.images import Image
 from db.models.order_statuses import OrderStatus
 from db.models.drink_sizes import  DrinkSize
+from db.models.sizes import Size
 
 EXCEPT_STATUSES = [6,7,8]
 
 async def get_user_by_tg_id(tg_user_id: int):
-    """Get user by Telegram ID"""
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(User).where(User.tg_user_id == tg_user_id)
-        )
-        return result.scalars().first()
+    """Get user identity by Telegram ID (cached, see utils.identity_cache)"""
+    return await get_identity(tg_user_id)
 
 
 async def create_user(tg_user, first_name=None, phone_number=None):
@@ -38,70 +38,162 @@ async def create_user(tg_user, first_name=None, phone_number=None):
         session.add(user)
         await session.commit()
         await session.refresh(user)
+        remember_identity(user)
         return user
 
 
-async def create_session(tg_user_id: int, role_id: int):
-    """Create new session with role"""
+# Сессия переиспользуется, пока пользователь был активен в пределах этого окна.
+# Активность — sessions.updated_at: его пишут этот upsert и запись черновика (flush_draft).
+SESSION_IDLE_WINDOW = timedelta(minutes=int(os.getenv("SESSION_IDLE_MINUTES", "720")))
+
+# Живая сессия пользователя с этой ролью (отмечаем активность) или, если её нет,
+# закрытие старых сессий этой роли и создание новой — всё одним оператором.
+_SESSION_UPSERT_SQL = text("""
+WITH cand AS (
+    SELECT id FROM public.sessions
+     WHERE tg_user_id = :tg_user_id
+       AND role_id = :role_id
+       AND is_active
+       AND COALESCE(updated_at, created_at) >= :cutoff
+     ORDER BY COALESCE(updated_at, created_at) DESC
+     LIMIT 1
+), cur AS (
+    UPDATE public.sessions s
+       SET updated_at = :now
+      FROM cand
+     WHERE s.id = cand.id
+    RETURNING s.id
+), closed AS (
+    UPDATE public.sessions
+       SET is_active = false, finished_at = :now
+     WHERE tg_user_id = :tg_user_id
+       AND role_id = :role_id
+       AND is_active
+       AND NOT EXISTS (SELECT 1 FROM cand)
+), ins AS (
+    INSERT INTO public.sessions (tg_user_id, role_id, created_at, updated_at, is_active)
+    SELECT :tg_user_id, :role_id, :now, :now, true
+     WHERE NOT EXISTS (SELECT 1 FROM cand)
+    RETURNING id
+)
+SELECT id FROM cur
+UNION ALL
+SELECT id FROM ins
+""")
+
+
+async def get_or_create_session(tg_user_id: int, role_id: int) -> int:
+    """Id активной сессии пользователя с этой ролью; новая создаётся только после простоя."""
+    now = datetime.utcnow()
     async with get_async_session() as session:
-        new_session = Session(
-            tg_user_id=tg_user_id,
-            role_id=role_id,
-            created_at=datetime.utcnow(),
-            updated_at=datetime.utcnow()
-        )
-        session.add(new_session)
+        session_id = (await session.execute(
+            _SESSION_UPSERT_SQL,
+            {
+                "tg_user_id": tg_user_id,
+                "role_id": role_id,
+                "cutoff": now - SESSION_IDLE_WINDOW,
+                "now": now,
+            }
+        )).scalar_one()
         await session.commit()
-        await session.refresh(new_session)
-        return new_session
+        return session_id
 
-async def get_last_order(tg_user_id: int) -> dict | None:
+
+async def resolve_session_id(user_data: dict, tg_user_id: int, role_id: int) -> int:
+    """
+    Сессия для /start: если в user_data уже есть сессия с той же ролью,
+    проверенная в БД не раньше половины окна простоя назад, — берём её без
+    обращения к БД. session_checked_at обновляется только при походе в БД
+    (он же отмечает активность), поэтому сессия всё равно закрывается после
+    простоя, а /start без заказов учитывается с точностью до половины окна.
+    """
+    now = datetime.utcnow()
+    checked_at = user_data.get("session_checked_at")
+    if (
+        user_data.get("session_id")
+        and user_data.get("role_id") == role_id
+        and checked_at is not None
+        and now - checked_at < SESSION_IDLE_WINDOW / 2
+    ):
+        return user_data["session_id"]
+    session_id = await get_or_create_session(tg_user_id, role_id)
+    user_data["session_checked_at"] = now
+    return session_id
+
+@dataclass(frozen=True)
+class LastOrder:
+    """Последний заказ пользователя — ровно то, что нужно меню постоянного клиента."""
+    id: int
+    drink_size_id: int
+    created_at: datetime
+    drink_name: str
+    size: str
+    drink_count: int
+    total_price: float
+    status_id: int
+    image_file_id: str | None
+
+
+async def get_last_order(tg_user_id: int) -> LastOrder | None:
     """
     Получает последний активный заказ пользователя с расшифровкой напитка и размера.
 
+    Один запрос-проекция: LIMIT 1 выполняется в подзапросе по orders
+    (индекс ix_orders_user_last_order), и только к этой строке присоединяются
+    размер, напиток и первое фото — без ORM-объектов и размножения строк по images.
+
     :param tg_user_id: Telegram ID пользователя
-    :return: dict с полями заказа или None
+    :return: LastOrder или None
     """
-    async with get_async_session() as session:
-        result = await session.execute(
-            select(Order)
-            .options(
-                joinedload(Order.drink_size)
-                .joinedload(DrinkSize.drink),   # связь с Drink
-                joinedload(Order.drink_size)
-                .joinedload(DrinkSize.sizes),   # связь с Size
-                joinedload(Order.drink_size)
-                .joinedload(DrinkSize.drink)
-                .joinedload(Drink.images)
+    last = (
+        select(
+            Order.id, Order.drink_size_id, Order.created_at,
+            Order.drink_count, Order.total_price, Order.status_id
+        )
+        .where(
+            Order.tg_user_id == tg_user_id,
+            Order.is_active == True,
+            ~Order.status_id.in_(EXCEPT_STATUSES)  # фильтр на исключаемые статусы
+        )
+        .order_by(desc(Order.created_at))
+        .limit(1)
+        .subquery("last_order")
+    )
+    first_image = (
+        select(Image.tg_file_id)
+        .where(Image.drink_id == Drink.id, Image.is_active == True)
+        .order_by(Image.created_at.asc())
+        .limit(1)
+        .correlate(Drink)
+        .scalar_subquery()
+    )
 
+    async with get_async_session() as session:
+        row = (await session.execute(
+            select(
+                last,
+                Drink.name.label("drink_name"),
+                Size.name.label("size_name"),
+                Size.volume_ml,
+                first_image.label("image_file_id")
             )
-            .where(
-                Order.tg_user_id == tg_user_id,
-                Order.is_active == True,
-                ~Order.status_id.in_(EXCEPT_STATUSES)  # фильтр на исключаемые статусы
-            )
-            .order_by(desc(Order.created_at))
-            .limit(1)
-        )
-        order = result.scalars().first()
-
-        if not order:
-            return None
-
-        drink = order.drink_size.drink
-        size = order.drink_size.sizes
-        media = None
-        if drink.images:
-            media = drink.images[0].tg_file_id
-
-        return {
-            "id": order.id,
-            "drink_size_id": order.drink_size_id,
-            "created_at": order.created_at,
-            "drink_name": drink.name if drink else "Неизвестно",
-            "size": f"{size.name} ({size.volume_ml} мл)" if size else "Неизвестный размер",
-            "drink_count": order.drink_count,
-            "total_price": float(order.total_price),
-            "status_id": order.status_id,
-            "image_file_id": media
-        }
\ No newline at end of file
+            .select_from(last)
+            .outerjoin(DrinkSize, DrinkSize.id == last.c.drink_size_id)
+            .outerjoin(Drink, Drink.id == DrinkSize.drink_id)
+            .outerjoin(Size, Size.id == DrinkSize.size_id)
+        )).first()
+
+    if not row:
+        return None
+
+    return LastOrder(
+        id=row.id,
+        drink_size_id=row.drink_size_id,
+        created_at=row.created_at,
+        drink_name=row.drink_name or "Неизвестно",
+        size=f"{row.size_name} ({row.volume_ml} мл)" if row.size_name else "Неизвестный размер",
+        drink_count=row.drink_count,
+        total_price=float(row.total_price),
+        status_id=row.status_id,
+        image_file_id=row.image_file_id,
+    )
@@ -0,0 +1,327 @@
+# log_viewer/app/log_index.py
+"""
+Incremental SQLite index of the bot's structured JSON logs.
+
+A background task tails ``bot_structured.log`` (and, on first start, its
+rotated ``.1``..``.N`` files) and stores every entry in a local SQLite
+database indexed by timestamp, level, user_id and action, so /api/logs is a
+range lookup instead of a full file scan.
+
+Rotation is tracked by inode: RotatingFileHandler renames the current file
+to ``.1``, so when the inode behind ``bot_structured.log`` changes, the rest
+of the old inode is read from whichever rotated file now carries it, and
+the new file is read from offset 0.
+"""
+import json
+import sqlite3
+import threading
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+STRUCTURED_LOG_NAME = "bot_structured.log"
+MAX_ROTATED_FILES = 5  # backupCount of the bot's RotatingFileHandler
+READ_CHUNK = 1024 * 1024
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS logs (
+    id INTEGER PRIMARY KEY,
+    ts REAL NOT NULL,
+    level TEXT,
+    user_id INTEGER,
+    action TEXT,
+    message TEXT,
+    raw TEXT NOT NULL,
+    action_lc TEXT,
+    search_text TEXT
+);
+CREATE INDEX IF NOT EXISTS ix_logs_ts ON logs (ts);
+CREATE INDEX IF NOT EXISTS ix_logs_level_ts ON logs (level, ts);
+CREATE INDEX IF NOT EXISTS ix_logs_user_ts ON logs (user_id, ts);
+CREATE INDEX IF NOT EXISTS ix_logs_action_ts ON logs (action, ts);
+CREATE TABLE IF NOT EXISTS cursors (
+    name TEXT PRIMARY KEY,
+    inode INTEGER NOT NULL,
+    offset INTEGER NOT NULL
+);
+"""
+
+
+def parse_timestamp(value: str) -> Optional[float]:
+    """Epoch seconds for the formatter's ISO timestamp (naive values are UTC)."""
+    try:
+        parsed = datetime.fromisoformat(value.replace('Z', '+00:00'))
+    except (AttributeError, ValueError):
+        return None
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=timezone.utc)
+    return parsed.timestamp()
+
+
+def _lowered(message: Any, action: Any) -> Tuple[str, str]:
+    """
+    Lowercased action and "message action" text for the substring filters.
+    SQLite's lower() only folds ASCII, and the bot logs mostly in Russian.
+    """
+    action_lc = action.lower() if isinstance(action, str) else ''
+    return action_lc, f"{message or ''} {action or ''}".lower()
+
+
+def to_epoch(value: datetime) -> float:
+    if value.tzinfo is None:
+        value = value.replace(tzinfo=timezone.utc)
+    return value.timestamp()
+
+
+def _read_complete_lines(path: Path, offset: int) -> Tuple[List[bytes], int]:
+    """Complete lines after ``offset`` and the offset right after the last newline."""
+    lines: List[bytes] = []
+    with open(path, 'rb') as f:
+        f.seek(offset)
+        pending = b''
+        while True:
+            chunk = f.read(READ_CHUNK)
+            if not chunk:
+                break
+            pending += chunk
+            *complete, pending = pending.split(b'\n')
+            lines.extend(complete)
+            offset += sum(len(line) + 1 for line in complete)
+    return lines, offset
+
+
+class LogIndex:
+    """SQLite-backed log store fed by ``ingest()``."""
+
+    def __init__(self, log_dir: str, db_path: str, retention_days: int = 7):
+        self.log_dir = Path(log_dir)
+        self.db_path = db_path
+        self.retention_seconds = retention_days * 86400
+        self.listeners: List[Callable[[List[Dict[str, Any]]], None]] = []
+        self._lock = threading.Lock()
+        Path(db_path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(db_path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.executescript(SCHEMA)
+        self._migrate()
+        # readers get their own read-only connections (one per thread), so
+        # with WAL they never wait for an ingest transaction
+        self._readers = threading.local()
+        self._reader_conns: List[sqlite3.Connection] = []
+        self.ready = False  # True after the first full ingest pass
+
+    def _migrate(self) -> None:
+        """Add and fill the lowercased filter columns in an index built before them."""
+        columns = {row[1] for row in self._conn.execute("PRAGMA table_info(logs)")}
+        if 'search_text' in columns:
+            return
+        with self._conn:
+            self._conn.execute("ALTER TABLE logs ADD COLUMN action_lc TEXT")
+            self._conn.execute("ALTER TABLE logs ADD COLUMN search_text TEXT")
+            rows = self._conn.execute("SELECT id, message, action FROM logs").fetchall()
+            self._conn.executemany(
+                "UPDATE logs SET action_lc = ?, search_text = ? WHERE id = ?",
+                [(*_lowered(message, action), row_id) for row_id, message, action in rows]
+            )
+
+    def _reader(self) -> sqlite3.Connection:
+        conn = getattr(self._readers, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(
+                f"file:{self.db_path}?mode=ro", uri=True, check_same_thread=False
+            )
+            self._readers.conn = conn
+            self._reader_conns.append(conn)
+        return conn
+
+    # --- ingest -----------------------------------------------------------
+
+    def _rotated_files(self) -> List[Path]:
+        """Rotated files, oldest first (.N .. .1)."""
+        files = []
+        for n in range(MAX_ROTATED_FILES, 0, -1):
+            path = self.log_dir / f"{STRUCTURED_LOG_NAME}.{n}"
+            if path.exists():
+                files.append(path)
+        return files
+
+    def _files_since(self, inode: int) -> List[Path]:
+        """
+        Rotated files written since the file with ``inode`` was current, oldest
+        first; the file carrying ``inode`` itself comes first when it still exists.
+        Several rotations may have happened between two polls.
+        """
+        rotated = self._rotated_files()
+        for i, path in enumerate(rotated):
+            try:
+                if path.stat().st_ino == inode:
+                    return rotated[i:]
+            except FileNotFoundError:
+                continue
+        return rotated  # the old file was already deleted: everything left is newer
+
+    def _get_cursor(self) -> Optional[Tuple[int, int]]:
+        row = self._conn.execute(
+            "SELECT inode, offset FROM cursors WHERE name = ?", (STRUCTURED_LOG_NAME,)
+        ).fetchone()
+        return (row[0], row[1]) if row else None
+
+    def _set_cursor(self, inode: int, offset: int) -> None:
+        self._conn.execute(
+            "INSERT INTO cursors (name, inode, offset) VALUES (?, ?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET inode = excluded.inode, offset = excluded.offset",
+            (STRUCTURED_LOG_NAME, inode, offset)
+        )
+
+    @staticmethod
+    def _parse(lines: List[bytes]) -> Iterator[Tuple[Dict[str, Any], str]]:
+        for line in lines:
+            text = line.decode('utf-8', errors='replace').strip()
+            if not text:
+                continue
+            try:
+                entry = json.loads(text)
+            except json.JSONDecodeError:
+                continue
+            if isinstance(entry, dict):
+                yield entry, text
+
+    def _store(self, lines: List[bytes]) -> List[Dict[str, Any]]:
+        entries = []
+        rows = []
+        for entry, text in self._parse(lines):
+            ts = parse_timestamp(entry.get('timestamp'))
+            if ts is None:
+                continue
+            user_id = entry.get('user_id')
+            action, message = entry.get('action'), entry.get('message')
+            rows.append((
+                ts,
+                entry.get('level'),
+                user_id if isinstance(user_id, int) else None,
+                action,
+                message,
+                text,
+                *_lowered(message, action),
+            ))
+            entries.append(entry)
+        if rows:
+            self._conn.executemany(
+                "INSERT INTO logs (ts, level, user_id, action, message, raw, action_lc, search_text) "
+                "VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                rows
+            )
+        return entries
+
+    def ingest(self) -> int:
+        """Read everything appended since the last call. Returns the number of new entries."""
+        current = self.log_dir / STRUCTURED_LOG_NAME
+        new_entries: List[Dict[str, Any]] = []
+
+        with self._lock, self._conn:
+            cursor = self._get_cursor()
+            try:
+                stat = current.stat()
+            except FileNotFoundError:
+                return 0
+
+            if cursor is None:
+                # first start: backfill the rotated files, then the live file
+                for path in self._rotated_files():
+                    lines, _ = _read_complete_lines(path, 0)
+                    new_entries += self._store(lines)
+                offset = 0
+            else:
+                inode, offset = cursor
+                if inode != stat.st_ino:
+                    # rotated: finish the old file wherever it now lives,
+                    # then any files rotated after it
+                    for path in self._files_since(inode):
+                        start = offset if path.stat().st_ino == inode else 0
+                        lines, _ = _read_complete_lines(path, start)
+                        new_entries += self._store(lines)
+                    offset = 0
+                elif stat.st_size < offset:
+                    offset = 0  # truncated in place
+
+            lines, offset = _read_complete_lines(current, offset)
+            new_entries += self._store(lines)
+            self._set_cursor(stat.st_ino, offset)
+
+        self.ready = True
+        if new_entries:
+            for listener in self.listeners:
+                listener(new_entries)
+        return len(new_entries)
+
+    def prune(self, now: Optional[float] = None) -> int:
+        """Drop entries older than the retention window."""
+        cutoff = (now or datetime.now(timezone.utc).timestamp()) - self.retention_seconds
+        with self._lock, self._conn:
+            return self._conn.execute("DELETE FROM logs WHERE ts < ?", (cutoff,)).rowcount
+
+    # --- queries ----------------------------------------------------------
+
+    def query(
+        self,
+        limit: int = 100,
+        level: Optional[str] = None,
+        start_time: Optional[datetime] = None,
+        end_time: Optional[datetime] = None,
+        user_id: Optional[int] = None,
+        action: Optional[str] = None,
+        search_query: Optional[str] = None
+    ) -> List[Dict[str, Any]]:
+        """Newest-first entries with the same filter semantics as LogReader."""
+        where, params = [], []
+        if level:
+            where.append("level = ?")
+            params.append(level)
+        if user_id:
+            where.append("user_id = ?")
+            params.append(user_id)
+        if start_time:
+            where.append("ts >= ?")
+            params.append(to_epoch(start_time))
+        if end_time:
+            where.append("ts <= ?")
+            params.append(to_epoch(end_time))
+        if action:
+            where.append("instr(action_lc, ?) > 0")
+            params.append(action.lower())
+        if search_query:
+            where.append("instr(search_text, ?) > 0")
+            params.append(search_query.lower())
+
+        sql = "SELECT raw FROM logs"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY ts DESC, id DESC LIMIT ?"
+        params.append(limit)
+
+        rows = self._reader().execute(sql, params).fetchall()
+        return [json.loads(raw) for (raw,) in rows]
+
+    def iter_stats_rows(self, since: float, batch_size: int = 10000) -> Iterator[List[Tuple]]:
+        """
+        Batches of (ts, level, user_id, action, execution_time) since ``since``,
+        for warming LogStats.
+        """
+        last_id = 0
+        while True:
+            rows = self._reader().execute(
+                "SELECT id, ts, level, user_id, action, json_extract(raw, '$.execution_time') "
+                "FROM logs WHERE id > ? AND ts >= ? ORDER BY id LIMIT ?",
+                (last_id, since, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            last_id = rows[-1][0]
+            yield [row[1:] for row in rows]
+
+    def close(self) -> None:
+        for conn in self._reader_conns:
+            conn.close()
+        with self._lock:
+            self._conn.close()
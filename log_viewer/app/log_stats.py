@@ -0,0 +1,228 @@
+# log_viewer/app/log_stats.py
+"""
+Incremental, pre-aggregated statistics for the dashboard and /api/stats.
+
+Every indexed log entry is added once to a per-minute bucket and to its hour
+bucket. A bucket holds level and action counters, the error count, a
+HyperLogLog sketch of user ids and a log-bucketed sketch of execution times,
+so a 1h/24h/7d answer merges at most a few hundred buckets instead of
+re-reading the log files.
+
+Minute buckets are kept for MINUTE_RETENTION and cover the leading partial
+hour of a window; beyond that the oldest hour of the window is counted whole.
+"""
+import hashlib
+import math
+import threading
+import time
+from collections import Counter
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from log_index import parse_timestamp
+
+MINUTE = 60
+HOUR = 3600
+MINUTE_RETENTION = 3 * HOUR
+HOUR_RETENTION = 7 * 24 * HOUR + HOUR
+
+HLL_PRECISION = 10  # 1024 registers, ~3% standard error
+SKETCH_RELATIVE_ACCURACY = 0.02
+TOP_ACTIONS = 10
+
+# (ts, level, user_id, action, execution_time)
+StatsRow = Tuple[float, Optional[str], Optional[int], Optional[str], Optional[float]]
+
+
+class HyperLogLog:
+    """Approximate distinct counter over 2**precision one-byte registers."""
+
+    __slots__ = ("precision", "registers")
+
+    def __init__(self, precision: int = HLL_PRECISION):
+        self.precision = precision
+        self.registers = bytearray(1 << precision)
+
+    def add(self, value: Any) -> None:
+        digest = hashlib.blake2b(str(value).encode(), digest_size=8).digest()
+        x = int.from_bytes(digest, 'big')
+        index = x >> (64 - self.precision)
+        rest = x & ((1 << (64 - self.precision)) - 1)
+        rank = (64 - self.precision) - rest.bit_length() + 1
+        if rank > self.registers[index]:
+            self.registers[index] = rank
+
+    def merge(self, other: "HyperLogLog") -> None:
+        self.registers = bytearray(map(max, self.registers, other.registers))
+
+    def count(self) -> int:
+        m = len(self.registers)
+        zeros = self.registers.count(0)
+        if zeros == m:
+            return 0
+        alpha = 0.7213 / (1 + 1.079 / m)
+        estimate = alpha * m * m / sum(2.0 ** -r for r in self.registers)
+        if estimate <= 2.5 * m and zeros:
+            estimate = m * math.log(m / zeros)  # linear counting for small sets
+        return round(estimate)
+
+
+class QuantileSketch:
+    """
+    Log-bucketed histogram: values within ``relative_accuracy`` of each other
+    share a bucket, so quantiles come back with that relative error.
+    """
+
+    __slots__ = ("gamma", "log_gamma", "buckets", "count", "sum")
+
+    def __init__(self, relative_accuracy: float = SKETCH_RELATIVE_ACCURACY):
+        self.gamma = (1 + relative_accuracy) / (1 - relative_accuracy)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets: Dict[int, int] = {}
+        self.count = 0
+        self.sum = 0.0
+
+    def add(self, value: float) -> None:
+        key = math.ceil(math.log(value) / self.log_gamma)
+        self.buckets[key] = self.buckets.get(key, 0) + 1
+        self.count += 1
+        self.sum += value
+
+    def merge(self, other: "QuantileSketch") -> None:
+        for key, count in other.buckets.items():
+            self.buckets[key] = self.buckets.get(key, 0) + count
+        self.count += other.count
+        self.sum += other.sum
+
+    def quantile(self, q: float) -> float:
+        if not self.count:
+            return 0
+        rank = q * (self.count - 1)
+        seen = 0
+        for key in sorted(self.buckets):
+            seen += self.buckets[key]
+            if seen > rank:
+                return 2 * self.gamma ** key / (self.gamma + 1)
+        return 0
+
+
+class StatsBucket:
+    __slots__ = ("total", "levels", "actions", "errors", "users", "execution_times")
+
+    def __init__(self):
+        self.total = 0
+        self.levels: Counter = Counter()
+        self.actions: Counter = Counter()
+        self.errors = 0
+        self.users = HyperLogLog()
+        self.execution_times = QuantileSketch()
+
+    def add(self, level, user_id, action, execution_time) -> None:
+        self.total += 1
+        self.levels[level] += 1
+        if action:
+            self.actions[action] += 1
+        if level == 'ERROR':
+            self.errors += 1
+        if user_id:
+            self.users.add(user_id)
+        if execution_time and execution_time > 0:
+            self.execution_times.add(execution_time)
+
+    def merge(self, other: "StatsBucket") -> None:
+        self.total += other.total
+        self.levels.update(other.levels)
+        self.actions.update(other.actions)
+        self.errors += other.errors
+        self.users.merge(other.users)
+        self.execution_times.merge(other.execution_times)
+
+
+def entry_row(entry: Dict[str, Any]) -> Optional[StatsRow]:
+    ts = parse_timestamp(entry.get('timestamp'))
+    if ts is None:
+        return None
+    execution_time = entry.get('execution_time')
+    return (
+        ts,
+        entry.get('level'),
+        entry.get('user_id'),
+        entry.get('action'),
+        execution_time if isinstance(execution_time, (int, float)) else None,
+    )
+
+
+class LogStats:
+    """Minute and hour buckets, fed from LogIndex listeners."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._minutes: Dict[int, StatsBucket] = {}
+        self._hours: Dict[int, StatsBucket] = {}
+        self.ready = False  # True once the backfill from the index is done
+
+    def add_rows(self, rows: Iterable[StatsRow], now: Optional[float] = None) -> None:
+        now = now or time.time()
+        minute_floor = now - MINUTE_RETENTION
+        hour_floor = now - HOUR_RETENTION
+        with self._lock:
+            for ts, level, user_id, action, execution_time in rows:
+                if ts < hour_floor:
+                    continue
+                hour = int(ts // HOUR) * HOUR
+                bucket = self._hours.get(hour)
+                if bucket is None:
+                    bucket = self._hours[hour] = StatsBucket()
+                bucket.add(level, user_id, action, execution_time)
+                if ts >= minute_floor:
+                    minute = int(ts // MINUTE) * MINUTE
+                    bucket = self._minutes.get(minute)
+                    if bucket is None:
+                        bucket = self._minutes[minute] = StatsBucket()
+                    bucket.add(level, user_id, action, execution_time)
+            self._expire(now)
+
+    def add_entries(self, entries: Iterable[Dict[str, Any]]) -> None:
+        """LogIndex listener."""
+        self.add_rows(row for row in map(entry_row, entries) if row is not None)
+
+    def _expire(self, now: float) -> None:
+        minute_floor = now - MINUTE_RETENTION - MINUTE
+        hour_floor = now - HOUR_RETENTION - HOUR
+        for key in [k for k in self._minutes if k < minute_floor]:
+            del self._minutes[key]
+        for key in [k for k in self._hours if k < hour_floor]:
+            del self._hours[key]
+
+    def get_log_stats(self, hours: int = 24, now: Optional[float] = None) -> Dict[str, Any]:
+        """Same keys as LogReader.get_log_stats plus execution time percentiles."""
+        now = now or time.time()
+        cutoff = now - hours * HOUR
+        first_full_hour = math.ceil(cutoff / HOUR) * HOUR
+        merged = StatsBucket()
+
+        with self._lock:
+            if cutoff >= now - MINUTE_RETENTION:
+                # leading partial hour from minute buckets
+                for minute, bucket in self._minutes.items():
+                    if cutoff <= minute < first_full_hour:
+                        merged.merge(bucket)
+                hour_start = first_full_hour
+            else:
+                hour_start = first_full_hour - HOUR
+            for hour, bucket in self._hours.items():
+                if hour >= hour_start:
+                    merged.merge(bucket)
+
+        times = merged.execution_times
+        return {
+            'total_logs': merged.total,
+            'level_distribution': dict(merged.levels),
+            'top_actions': dict(merged.actions.most_common(TOP_ACTIONS)),
+            'error_count': merged.errors,
+            'unique_users': merged.users.count(),
+            'avg_execution_time': round(times.sum / times.count, 3) if times.count else 0,
+            'execution_time_p50': round(times.quantile(0.50), 3),
+            'execution_time_p95': round(times.quantile(0.95), 3),
+            'execution_time_p99': round(times.quantile(0.99), 3),
+            'timeframe_hours': hours
+        }
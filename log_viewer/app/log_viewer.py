@@ -12,6 +12,42 @@ from typing import List, Optional, Dict, Any
 import re
 from collections import Counter
 import gzip
+import logging
+import mmap
+
+from log_index import LogIndex, MAX_ROTATED_FILES, STRUCTURED_LOG_NAME, parse_timestamp, to_epoch
+from log_stats import HOUR_RETENTION, LogStats
+
+logger = logging.getLogger("log_viewer")
+
+LOG_DIR = os.getenv("LOG_DIR", "/app/logs")
+LOG_INDEX_ENABLED = os.getenv("LOG_INDEX_ENABLED", "true").lower() in ("1", "true", "yes", "on")
+LOG_INDEX_PATH = os.getenv("LOG_INDEX_PATH", "/app/data/log_index.sqlite3")
+LOG_INDEX_POLL_INTERVAL = float(os.getenv("LOG_INDEX_POLL_INTERVAL", "2"))
+LOG_INDEX_RETENTION_DAYS = int(os.getenv("LOG_INDEX_RETENTION_DAYS", "7"))
+LOG_INDEX_PRUNE_INTERVAL = 3600  # seconds
+
+
+def iter_lines_reversed(path: Path):
+    """
+    Yield the lines of a file last to first without reading it whole.
+
+    The file is memory-mapped and walked backwards with rfind, so only the
+    pages holding the returned lines are touched.
+    """
+    with open(path, 'rb') as f:
+        try:
+            mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        except ValueError:  # empty file
+            return
+        with mm:
+            end = len(mm)
+            while end > 0:
+                start = mm.rfind(b'\n', 0, end - 1) + 1
+                line = mm[start:end].strip()
+                if line:
+                    yield line
+                end = start
 
 class LogReader:
     def __init__(self, log_dir: str = "/app/logs"):
@@ -41,58 +77,69 @@ class LogReader:
         action: Optional[str] = None,
         search_query: Optional[str] = None
     ) -> List[Dict[str, Any]]:
-        """Read and filter structured logs"""
+        """
+        Read and filter structured logs, most recent first.
+
+        Walks the live file and then the rotated ones (.1 .. .N) backwards and
+        stops after ``limit`` matches or at the first entry older than
+        ``start_time``, so the cost depends on the result, not the file size.
+        """
         logs = []
-        structured_log_file = self.log_dir / "bot_structured.log"
-        
-        if not structured_log_file.exists():
-            return logs
-        
+        start_ts = to_epoch(start_time) if start_time else None
+        end_ts = to_epoch(end_time) if end_time else None
+        action = action.lower() if action else None
+        search_query = search_query.lower() if search_query else None
+
+        files = [self.log_dir / STRUCTURED_LOG_NAME] + [
+            self.log_dir / f"{STRUCTURED_LOG_NAME}.{n}" for n in range(1, MAX_ROTATED_FILES + 1)
+        ]
         try:
-            with open(structured_log_file, 'r', encoding='utf-8') as f:
-                for line in f:
-                    if not line.strip():
-                        continue
-                    
+            for path in files:
+                if not path.exists():
+                    continue
+                for line in iter_lines_reversed(path):
                     try:
-                        log_entry = json.loads(line.strip())
-                        
-                        # Apply filters
-                        if level and log_entry.get('level') != level:
-                            continue
-                        
-                        if user_id and log_entry.get('user_id') != user_id:
+                        log_entry = json.loads(line)
+                    except json.JSONDecodeError:
+                        continue  # e.g. a line still being written
+                    if not isinstance(log_entry, dict):
+                        continue
+
+                    # Time filtering: entries are in time order, so everything
+                    # past start_time is older still
+                    if start_ts is not None or end_ts is not None:
+                        log_ts = parse_timestamp(log_entry.get('timestamp'))
+                        if log_ts is None:
                             continue
-                        
-                        if action and action.lower() not in log_entry.get('action', '').lower():
+                        if start_ts is not None and log_ts < start_ts:
+                            return logs
+                        if end_ts is not None and log_ts > end_ts:
                             continue
-                        
-                        if search_query:
-                            search_text = f"{log_entry.get('message', '')} {log_entry.get('action', '')}".lower()
-                            if search_query.lower() not in search_text:
-                                continue
-                        
-                        # Time filtering
-                        if start_time or end_time:
-                            log_time = datetime.fromisoformat(log_entry['timestamp'].replace('Z', '+00:00'))
-                            if start_time and log_time < start_time:
-                                continue
-                            if end_time and log_time > end_time:
-                                continue
-                        
-                        logs.append(log_entry)
-                        
-                        if len(logs) >= limit:
-                            break
-                    
-                    except json.JSONDecodeError:
+
+                    # Apply filters
+                    if level and log_entry.get('level') != level:
                         continue
-        
+
+                    if user_id and log_entry.get('user_id') != user_id:
+                        continue
+
+                    if action and action not in (log_entry.get('action') or '').lower():
+                        continue
+
+                    if search_query:
+                        search_text = f"{log_entry.get('message', '')} {log_entry.get('action', '')}".lower()
+                        if search_query not in search_text:
+                            continue
+
+                    logs.append(log_entry)
+                    if len(logs) >= limit:
+                        return logs
+
         except Exception as e:
             print(f"Error reading logs: {e}")
-        
-        return list(reversed(logs))  # Most recent first
-    
+
+        return logs
+
     def get_log_stats(self, hours: int = 24) -> Dict[str, Any]:
         """Get logging statistics for the last N hours"""
         start_time = datetime.utcnow() - timedelta(hours=hours)
@@ -135,12 +182,62 @@ app = FastAPI(title="Bot Log Viewer", description="Web interface for viewing bot
 templates = Jinja2Templates(directory="app/templates")
 app.mount("/static", StaticFiles(directory="app/static"), name="static")
 
-log_reader = LogReader()
+log_reader = LogReader(LOG_DIR)
+log_index = LogIndex(LOG_DIR, LOG_INDEX_PATH, LOG_INDEX_RETENTION_DAYS) if LOG_INDEX_ENABLED else None
+log_stats = LogStats()
+
+
+def _backfill_stats():
+    """Warm the stats buckets from what is already indexed."""
+    since = to_epoch(datetime.utcnow()) - HOUR_RETENTION
+    for rows in log_index.iter_stats_rows(since):
+        log_stats.add_rows(rows)
+
+
+async def _tail_logs():
+    """Keep the SQLite index and the stats buckets in step with the log files."""
+    last_prune = 0.0
+    loop = asyncio.get_running_loop()
+    try:
+        # before the first ingest, so nothing is counted twice
+        await asyncio.to_thread(_backfill_stats)
+    except Exception as e:
+        logger.exception(f"Log stats backfill failed: {e}")
+    log_index.listeners.append(log_stats.add_entries)
+    log_stats.ready = True
+    while True:
+        try:
+            await asyncio.to_thread(log_index.ingest)
+            if loop.time() - last_prune > LOG_INDEX_PRUNE_INTERVAL:
+                await asyncio.to_thread(log_index.prune)
+                last_prune = loop.time()
+        except Exception as e:
+            logger.exception(f"Log index ingest failed: {e}")
+        await asyncio.sleep(LOG_INDEX_POLL_INTERVAL)
+
+
+@app.on_event("startup")
+async def start_log_index():
+    if log_index is not None:
+        app.state.log_index_task = asyncio.create_task(_tail_logs())
+
+
+@app.on_event("shutdown")
+async def stop_log_index():
+    task = getattr(app.state, "log_index_task", None)
+    if task is not None:
+        task.cancel()
+
+def _get_stats(hours: int = 24) -> Dict[str, Any]:
+    # pre-aggregated buckets once they cover the index, file scan until then
+    if log_stats.ready and log_index is not None and log_index.ready:
+        return log_stats.get_log_stats(hours=hours)
+    return log_reader.get_log_stats(hours=hours)
 
 @app.get("/")
 async def dashboard(request: Request):
     """Main dashboard page"""
-    stats = log_reader.get_log_stats()
+    stats = _get_stats()
     return templates.TemplateResponse(
         "dashboard.html",
         {"request": request, "stats": stats}
@@ -158,7 +255,11 @@ async def get_logs(
     """API endpoint to get filtered logs"""
     start_time = datetime.utcnow() - timedelta(hours=hours) if hours else None
     
-    logs = log_reader.read_structured_logs(
+    # indexed lookup once the first ingest pass is done, file scan until then
+    source = log_index if log_index is not None and log_index.ready else None
+    read = source.query if source is not None else log_reader.read_structured_logs
+    logs = await asyncio.to_thread(
+        read,
         limit=limit,
         level=level,
         start_time=start_time,
@@ -183,7 +284,7 @@ async def get_logs(
 @app.get("/api/stats")
 async def get_stats(hours: int = Query(24, ge=1, le=168)):
     """API endpoint to get logging statistics"""
-    return log_reader.get_log_stats(hours=hours)
+    return _get_stats(hours=hours)
 
 @app.get("/api/files")
 async def get_log_files():